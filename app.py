@@ -1,6 +1,7 @@
 from flask import Flask, render_template, request, jsonify
 from datetime import datetime
 import os
+import click
 from dotenv import load_dotenv
 from flask_login import LoginManager, login_required
 import logging
@@ -8,6 +9,12 @@ import logging
 # Import extensions
 from extensions import db, migrate, login_manager, socketio
 from models import User, MenuItem, Order, OrderItem, Table, Feedback
+from utils.sqlite_profile import default_sqlite_pragmas, configure_sqlite_engine
+from utils.db_pool import engine_options_from_env, instrument_pool
+from utils.request_timing import init_request_timing
+from utils.rollups import rebuild_rollups_command
+from utils.order_changes import prune_order_changes_command
+from utils.socket_queue import socketio_options, configure_presence
 
 # Import blueprints
 from routes.auth import auth_bp
@@ -15,6 +22,10 @@ from routes.menu import menu_bp
 from routes.table import table_bp
 from routes.orders import orders
 from routes.profile import profile_bp
+from routes.jobs import jobs_bp
+from routes.metrics import metrics_bp
+from routes.kitchen import kitchen_bp
+from routes.admin import admin_bp
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +45,9 @@ def create_app(config=None):
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///fooder.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['SQLITE_PRAGMAS'] = default_sqlite_pragmas()  # None keeps SQLite's defaults
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE')  # None for a single worker
     
     # Server configuration for QR codes
     if os.environ.get('SERVER_NAME'):
@@ -47,6 +61,9 @@ def create_app(config=None):
         else:
             app.config.from_object(config)
     
+    # Pool size, overflow, recycle and pre-ping from DB_POOL_* unless set explicitly
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI']))
+    
     # Ensure upload directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(os.path.join(app.static_folder, 'qr_codes'), exist_ok=True)
@@ -56,7 +73,16 @@ def create_app(config=None):
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
-    socketio.init_app(app)
+    # Workers share emits and room presence through the message queue, if any
+    socketio.init_app(app, **socketio_options(app.config['SOCKETIO_MESSAGE_QUEUE']))
+    configure_presence(app.config['SOCKETIO_MESSAGE_QUEUE'])
+    
+    # Apply the SQLite profile (WAL, busy timeout, ...) to every new connection
+    with app.app_context():
+        configure_sqlite_engine(db.engine, app.config['SQLITE_PRAGMAS'])
+        instrument_pool(db.engine)
+        # Query count, DB/template time and latency per request (utils/request_timing.py)
+        init_request_timing(app, db.engine)
     
     @login_manager.user_loader
     def load_user(user_id):
@@ -68,6 +94,15 @@ def create_app(config=None):
     app.register_blueprint(table_bp)
     app.register_blueprint(orders)
     app.register_blueprint(profile_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(kitchen_bp)
+    app.register_blueprint(admin_bp)
+    
+    # flask rebuild-rollups backfills the dashboard rollups from the order history
+    app.cli.add_command(rebuild_rollups_command)
+    # flask prune-order-changes trims the change log behind /api/active-orders?since=
+    app.cli.add_command(prune_order_changes_command)
     
     # Import the socket notifications blueprint after initializing socketio
     from routes.socket_notifications import notification_bp
@@ -100,9 +135,11 @@ def create_app(config=None):
 # Create the application instance
 app = create_app()
 
-# Initialize database
-with app.app_context():
-    db.create_all()
+# Initialize database, except under the flask CLI where `flask db upgrade` owns the
+# schema: tables created here first would make its create_table migrations fail
+if click.get_current_context(silent=True) is None:
+    with app.app_context():
+        db.create_all()
 
 if __name__ == '__main__':
     # Run with socketio instead of app.run
@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+# Runs in a fresh interpreter so every measurement is a real cold start
+CHILD_CODE = """
+import sys, time, json
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+created = time.perf_counter()
+print(json.dumps({
+    'import_app': imported - start,
+    'create_app': created - imported,
+    'modules': len(sys.modules),
+    'genai_loaded': 'google.generativeai' in sys.modules
+}))
+"""
+
+def measure(source_dir, runs):
+    """Cold-start the app in source_dir the given number of times."""
+    env = dict(os.environ)
+    # Keep the benchmark away from the real database
+    env['DATABASE_URL'] = 'sqlite://'
+    env.setdefault('GEMINI_API_KEY', 'benchmark')
+
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD_CODE],
+            cwd=source_dir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+def export_ref(ref, target_dir):
+    """Write the tree of a git ref into target_dir."""
+    archive = subprocess.run(['git', 'archive', ref], capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', target_dir], input=archive, check=True)
+
+def report(label, results):
+    import_times = [r['import_app'] * 1000 for r in results]
+    create_times = [r['create_app'] * 1000 for r in results]
+    print(f"{label}:")
+    print(f"  import app (incl. module-level create_app): median {statistics.median(import_times):.1f} ms, "
+          f"min {min(import_times):.1f} ms")
+    print(f"  create_app() in a warm process: median {statistics.median(create_times):.1f} ms")
+    print(f"  modules loaded: {results[-1]['modules']}, google.generativeai loaded: {results[-1]['genai_loaded']}")
+
+# Main execution
+if __name__ == "__main__":
+    # Usage: python bench_cold_start.py [runs] [git ref to compare against, e.g. HEAD~1]
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    compare_ref = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if compare_ref:
+        baseline_dir = tempfile.mkdtemp(prefix='cold_start_')
+        try:
+            export_ref(compare_ref, baseline_dir)
+            report(f"Before ({compare_ref})", measure(baseline_dir, runs))
+        finally:
+            shutil.rmtree(baseline_dir, ignore_errors=True)
+
+    report("Working tree", measure(os.path.dirname(os.path.abspath(__file__)), runs))
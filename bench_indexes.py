@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+# Keep the output readable - we only care about plans and timings here
+logging.basicConfig(level=logging.WARNING)
+
+# Indexes added for the hot order/menu queries (migration 5d3e9a7c1b28)
+NEW_INDEXES = (
+    'ix_orders_user_id_status_created_at',
+    'ix_orders_user_id_created_at',
+    'ix_orders_table_id_created_at',
+    'ix_order_item_order_id',
+    'ix_order_item_menu_item_id',
+    'ix_menu_item_user_id_is_available_category'
+)
+
+# The statements behind the order screens, menu pages and sales lookups
+QUERIES = (
+    # Sorted in Python: with an ORDER BY the planner walks the restaurant's whole history by date
+    ('active orders',
+     "SELECT * FROM orders WHERE user_id = :restaurant AND status IN ('pending', 'preparing', 'ready')"),
+    ('order history page',
+     "SELECT * FROM orders WHERE user_id = :restaurant AND status IN ('completed', 'cancelled') "
+     "ORDER BY created_at DESC, id DESC LIMIT 51"),
+    ('receipts page',
+     "SELECT * FROM orders WHERE user_id = :restaurant AND status != 'cancelled' "
+     "ORDER BY created_at DESC, id DESC LIMIT 51"),
+    ('table history page',
+     "SELECT * FROM orders WHERE table_id = :table ORDER BY created_at DESC, id DESC LIMIT 51"),
+    ('items of an order',
+     "SELECT * FROM order_item WHERE order_id = :order"),
+    ('sales of a menu item',
+     "SELECT SUM(quantity) FROM order_item WHERE menu_item_id = :menu_item"),
+    ('available menu',
+     "SELECT * FROM menu_item WHERE user_id = :restaurant AND is_available = 1 ORDER BY category")
+)
+
+ACTIVE_STATUSES = ('pending', 'preparing', 'ready')
+
+def create_bench_app(path):
+    """Create an app bound to a throwaway SQLite file."""
+    # Importing app creates its module-level app and tables; keep those off the .env database
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    # Import here to avoid circular imports
+    from app import create_app
+
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'
+    })
+
+def seed(restaurants, orders_per_restaurant, tables_per_restaurant=20, menu_items_per_restaurant=60):
+    """Bulk-insert a synthetic dataset; returns the ids the queries are sampled from."""
+    from models import db, User, Table, MenuItem, Order, OrderItem
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    db.session.execute(db.insert(User), [
+        {'id': r, 'name': f'Bench {r}', 'email': f'bench-{r}@example.com', 'password_hash': 'x',
+         'restaurant_name': f'Bench {r}', 'slug': f'bench-{r}'}
+        for r in range(1, restaurants + 1)
+    ])
+
+    tables = {r: list(range((r - 1) * tables_per_restaurant + 1, r * tables_per_restaurant + 1))
+              for r in range(1, restaurants + 1)}
+    db.session.execute(db.insert(Table), [
+        {'id': table_id, 'user_id': r, 'number': n + 1}
+        for r, table_ids in tables.items() for n, table_id in enumerate(table_ids)
+    ])
+
+    categories = ('Starters', 'Mains', 'Desserts', 'Drinks', 'Sides')
+    menu_items = {r: list(range((r - 1) * menu_items_per_restaurant + 1, r * menu_items_per_restaurant + 1))
+                  for r in range(1, restaurants + 1)}
+    db.session.execute(db.insert(MenuItem), [
+        {'id': item_id, 'user_id': r, 'name': f'Item {item_id}', 'price': 5.0 + n % 20,
+         'category': categories[n % len(categories)], 'is_available': n % 10 != 0}
+        for r, item_ids in menu_items.items() for n, item_id in enumerate(item_ids)
+    ])
+
+    order_id = 0
+    for r in range(1, restaurants + 1):
+        orders, order_items = [], []
+        for _ in range(orders_per_restaurant):
+            order_id += 1
+            created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            # Like a real restaurant: only the last couple of hours are still open
+            if now - created_at < timedelta(hours=2):
+                status = rng.choice(ACTIVE_STATUSES)
+            else:
+                status = 'cancelled' if rng.random() < 0.1 else 'completed'
+            orders.append({'id': order_id, 'user_id': r, 'table_id': rng.choice(tables[r]),
+                           'status': status, 'created_at': created_at, 'updated_at': created_at})
+            for menu_item_id in rng.sample(menu_items[r], 3):
+                order_items.append({'order_id': order_id, 'menu_item_id': menu_item_id,
+                                    'quantity': rng.randint(1, 3), 'unit_price': 10.0})
+        db.session.execute(db.insert(Order), orders)
+        db.session.execute(db.insert(OrderItem), order_items)
+
+    db.session.commit()
+    return {
+        'restaurant': list(range(1, restaurants + 1)),
+        'table': [table_id for table_ids in tables.values() for table_id in table_ids],
+        'order': list(range(1, order_id + 1)),
+        'menu_item': [item_id for item_ids in menu_items.values() for item_id in item_ids]
+    }
+
+def new_indexes():
+    """The SQLAlchemy Index objects for NEW_INDEXES, taken from the models."""
+    from models import db
+
+    return [index for table in db.metadata.sorted_tables for index in table.indexes if index.name in NEW_INDEXES]
+
+def explain(sql, params):
+    from models import db
+
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params).all()
+    return '; '.join(row[-1] for row in rows)
+
+def time_query(sql, ids, runs):
+    """Median time in ms of one query over runs random parameter samples."""
+    from models import db
+
+    rng = random.Random(7)
+    timings = []
+    for _ in range(runs):
+        params = {name: rng.choice(values) for name, values in ids.items() if f':{name}' in sql}
+        start = time.perf_counter()
+        db.session.execute(text(sql), params).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def measure(ids, runs):
+    results = {}
+    for label, sql in QUERIES:
+        params = {name: values[0] for name, values in ids.items() if f':{name}' in sql}
+        results[label] = (explain(sql, params), time_query(sql, ids, runs))
+    return results
+
+# Main execution
+if __name__ == "__main__":
+    # Usage: python bench_indexes.py [restaurants] [orders per restaurant] [runs per query]
+    restaurants = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    orders_per_restaurant = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    from models import db
+
+    fd, path = tempfile.mkstemp(prefix='bench_indexes_', suffix='.sqlite')
+    os.close(fd)
+    try:
+        app = create_bench_app(path)
+        with app.app_context():
+            db.create_all()
+            # Start from the schema as it was before the migration
+            for index in new_indexes():
+                index.drop(db.session.connection())
+
+            start = time.perf_counter()
+            ids = seed(restaurants, orders_per_restaurant)
+            print(f"Seeded {restaurants} restaurants, {len(ids['order'])} orders, "
+                  f"{len(ids['order']) * 3} order items in {time.perf_counter() - start:.1f} s")
+
+            db.session.execute(text('ANALYZE'))
+            before = measure(ids, runs)
+
+            for index in new_indexes():
+                index.create(db.session.connection())
+            db.session.execute(text('ANALYZE'))
+            after = measure(ids, runs)
+
+        for label, _ in QUERIES:
+            print(f"\n{label}: {before[label][1]:.3f} ms -> {after[label][1]:.3f} ms (median of {runs})")
+            print(f"  before: {before[label][0]}")
+            print(f"  after:  {after[label][0]}")
+    finally:
+        os.remove(path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import statistics
+import multiprocessing
+
+# Each worker process is its own app instance, like gunicorn workers sharing one SQLite file.
+# The environment is set before the app is imported, so everything happens inside the workers.
+
+SEED_TABLES = 20
+SEED_MENU_ITEMS = 30
+SEED_ORDERS = 200
+
+def load_app(path, profile):
+    """Import the app bound to the SQLite file, with or without the SQLite profile."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SQLITE_PROFILE'] = 'production' if profile else 'off'
+    os.environ['AI_BACKEND'] = 'stub'
+    logging.disable(logging.WARNING)
+
+    from app import app
+    return app
+
+def setup(path, profile):
+    """Create a restaurant with tables, a menu and some orders for the kitchen to work on."""
+    app = load_app(path, profile)
+    from models import db, User, Table, MenuItem, Order
+
+    with app.app_context():
+        restaurant = User(name='Bench', email='bench@example.com', restaurant_name='Bench', slug='bench')
+        restaurant.set_password('bench')
+        db.session.add(restaurant)
+        db.session.flush()
+        db.session.add_all([Table(user_id=restaurant.id, number=n) for n in range(1, SEED_TABLES + 1)])
+        db.session.add_all([
+            MenuItem(name=f'Item {n}', price=5.0 + n, category='Mains', user_id=restaurant.id)
+            for n in range(SEED_MENU_ITEMS)
+        ])
+        db.session.flush()
+        tables = [table.id for table in Table.query.filter_by(user_id=restaurant.id)]
+        db.session.add_all([
+            Order(user_id=restaurant.id, table_id=tables[n % len(tables)]) for n in range(SEED_ORDERS)
+        ])
+        db.session.commit()
+        return {
+            'restaurant': restaurant.id,
+            'tables': tables,
+            'menu_items': [item.id for item in MenuItem.query.filter_by(user_id=restaurant.id)],
+            'orders': [order.id for order in Order.query.filter_by(user_id=restaurant.id)]
+        }
+
+def guest(path, profile, ids, duration, seed):
+    """Place orders as fast as possible for duration seconds."""
+    app = load_app(path, profile)
+    client = app.test_client()
+    rng = random.Random(seed)
+
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        order_data = {
+            'table_id': rng.choice(ids['tables']),
+            'items': [{'id': item_id, 'quantity': rng.randint(1, 3)} for item_id in rng.sample(ids['menu_items'], 3)]
+        }
+        start = time.perf_counter()
+        try:
+            ok = client.post('/api/orders', json=order_data).status_code == 201
+        except Exception:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    return latencies, errors
+
+def kitchen(path, profile, ids, duration, seed):
+    """Move orders through the kitchen statuses for duration seconds."""
+    app = load_app(path, profile)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(ids['restaurant'])
+        session['_fresh'] = True
+    rng = random.Random(seed)
+
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        order_id = rng.choice(ids['orders'])
+        start = time.perf_counter()
+        try:
+            ok = client.put(f'/api/orders/{order_id}/status',
+                            json={'status': rng.choice(('preparing', 'ready', 'completed'))}).status_code == 200
+        except Exception:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    return latencies, errors
+
+def run(profile, guests, kitchens, duration):
+    fd, path = tempfile.mkstemp(prefix='bench_sqlite_', suffix='.sqlite')
+    os.close(fd)
+    os.remove(path)
+    context = multiprocessing.get_context('spawn')
+    try:
+        with context.Pool(1) as pool:
+            ids = pool.apply(setup, (path, profile))
+
+        with context.Pool(guests + kitchens) as pool:
+            guest_results = [pool.apply_async(guest, (path, profile, ids, duration, n)) for n in range(guests)]
+            kitchen_results = [pool.apply_async(kitchen, (path, profile, ids, duration, n)) for n in range(kitchens)]
+            guest_results = [result.get() for result in guest_results]
+            kitchen_results = [result.get() for result in kitchen_results]
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    report('SQLite profile' if profile else 'SQLite defaults', guest_results, kitchen_results, duration)
+
+def report(label, guest_results, kitchen_results, duration):
+    print(f"{label}:")
+    for name, results in (('orders placed', guest_results), ('status updates', kitchen_results)):
+        latencies = [latency * 1000 for worker_latencies, _ in results for latency in worker_latencies]
+        errors = sum(worker_errors for _, worker_errors in results)
+        if latencies:
+            p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+            print(f"  {name}: {len(latencies) / duration:.1f}/s, median {statistics.median(latencies):.1f} ms, "
+                  f"p95 {p95:.1f} ms, {errors} failed")
+        else:
+            print(f"  {name}: none succeeded, {errors} failed")
+
+# Main execution
+if __name__ == "__main__":
+    # Usage: python bench_sqlite_concurrency.py [guest processes] [kitchen processes] [seconds]
+    guests = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    kitchens = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    print(f"{guests} guest and {kitchens} kitchen processes for {duration:.0f} s each run\n")
+    run(False, guests, kitchens, duration)
+    run(True, guests, kitchens, duration)
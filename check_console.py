@@ -45,33 +45,23 @@ def check_database():
         print(f"Found {len(users)} users in database")
 
 def check_socketio_state():
-    """Check the status of Socket.IO connections and notification cache."""
+    """Check the Socket.IO notification replay buffers."""
     # Import here to avoid circular imports
     from app import app
     
     with app.app_context():
         try:
-            # Import the Socket.IO structures from socket_notifications
-            from routes.socket_notifications import connected_clients, customer_tables, notification_cache
+            # Import the Socket.IO structures
+            from utils.notification_buffer import notification_buffers
             
             print("\nChecking Socket.IO state...")
-            
-            # Check connected clients
-            print(f"Connected clients by table: {len(connected_clients)} tables")
-            for table_id, clients in connected_clients.items():
-                print(f"Table {table_id}: {len(clients)} connected clients")
-                
-            # Check customer tables mapping
-            print(f"Customer-table mappings: {len(customer_tables)} customers")
-            for customer_id, tables in customer_tables.items():
-                print(f"Customer {customer_id}: associated with {len(tables)} tables: {', '.join(map(str, tables))}")
                 
-            # Check notification cache
-            print(f"Notification cache: {len(notification_cache)} entries")
-            for room, notifications in notification_cache.items():
-                print(f"Room {room}: {len(notifications)} cached notifications")
-                if notifications:
-                    print(f"  First notification: {notifications[0]['title'] if 'title' in notifications[0] else 'Unknown'}")
+            # Check the notification replay buffers
+            print(f"Notification buffers: {len(notification_buffers)} rooms")
+            for room, buffer in notification_buffers.items():
+                print(f"Room {room}: {len(buffer['events'])} buffered events, last seq {buffer['seq']}")
+                if buffer['events']:
+                    print(f"  Oldest buffered event: {buffer['events'][0][2]} (seq {buffer['events'][0][0]})")
                     
         except ImportError as e:
             print(f"Error importing Socket.IO structures: {e}")
@@ -0,0 +1,219 @@
+import os
+import sys
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Keep the output readable - we only care about the query counts here
+logging.basicConfig(level=logging.WARNING)
+
+def create_check_app():
+    """Create an app bound to a throwaway in-memory database."""
+    # Importing app creates its module-level app and tables; keep those off the .env database
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    # Import here to avoid circular imports
+    from app import create_app
+    from extensions import db
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://'
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements executed on the engine inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def seed_restaurant(num_orders, items_per_order=3, status='pending'):
+    """Create a restaurant with the given number of orders in one status."""
+    from models import User, MenuItem, Order, OrderItem, Table, db
+
+    restaurant = User(name='Check', email=f'check-{num_orders}-{status}@example.com', restaurant_name=f'Check {num_orders}')
+    restaurant.set_password('check')
+    db.session.add(restaurant)
+    db.session.flush()
+
+    tables = [Table(user_id=restaurant.id, number=n) for n in range(1, 6)]
+    menu_items = [
+        MenuItem(name=f'Item {n}', price=5.0 + n, category='Mains', user_id=restaurant.id)
+        for n in range(items_per_order)
+    ]
+    db.session.add_all(tables + menu_items)
+    db.session.flush()
+
+    for n in range(num_orders):
+        order = Order(user_id=restaurant.id, table_id=tables[n % len(tables)].id, status=status)
+        order.items = [
+            OrderItem(menu_item_id=menu_item.id, quantity=1, unit_price=menu_item.price)
+            for menu_item in menu_items
+        ]
+        db.session.add(order)
+
+    db.session.commit()
+    return restaurant.id
+
+def queries_for(app, restaurant_id, url):
+    """Return the number of queries a logged-in GET request to url costs."""
+    from extensions import db
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(restaurant_id)
+        session['_fresh'] = True
+
+    with app.app_context():
+        with count_queries(db.engine) as statements:
+            response = client.get(url)
+
+    if response.status_code != 200:
+        raise AssertionError(f"GET {url} returned {response.status_code}: {response.get_data(as_text=True)}")
+    return len(statements)
+
+def check_active_orders(app):
+    """The active order feed must cost the same number of queries for 1 or 40 orders."""
+    with app.app_context():
+        small = seed_restaurant(1)
+        large = seed_restaurant(40)
+
+    small_count = queries_for(app, small, '/api/active-orders')
+    large_count = queries_for(app, large, '/api/active-orders')
+    print(f"/api/active-orders: {small_count} queries for 1 order, {large_count} queries for 40 orders")
+
+    if small_count != large_count:
+        raise AssertionError("Query count of /api/active-orders grows with the number of orders")
+
+def check_create_order(app):
+    """Placing an order must cost the same number of queries for 1 or 20 items."""
+    from extensions import db
+    from models import MenuItem, Table
+
+    with app.app_context():
+        restaurant_id = seed_restaurant(0, items_per_order=20)
+        table_id = Table.query.filter_by(user_id=restaurant_id).first().id
+        menu_item_ids = [item.id for item in MenuItem.query.filter_by(user_id=restaurant_id)]
+
+    counts = []
+    client = app.test_client()
+    for size in (1, 20):
+        order_data = {
+            'table_id': table_id,
+            'items': [{'id': menu_item_id, 'quantity': 2} for menu_item_id in menu_item_ids[:size]]
+        }
+        with app.app_context():
+            with count_queries(db.engine) as statements:
+                response = client.post('/api/orders', json=order_data)
+        if response.status_code != 201:
+            raise AssertionError(f"POST /api/orders returned {response.status_code}: {response.get_data(as_text=True)}")
+        counts.append(len(statements))
+
+    print(f"POST /api/orders: {counts[0]} queries for 1 item, {counts[1]} queries for 20 items")
+
+    if counts[0] != counts[1]:
+        raise AssertionError("Query count of POST /api/orders grows with the number of items")
+
+def check_order_history(app):
+    """Order history, table history and receipts must cost the same number of queries for 1 or 40 orders."""
+    from models import Table
+
+    with app.app_context():
+        small = seed_restaurant(1, status='completed')
+        large = seed_restaurant(40, status='completed')
+        small_table = Table.query.filter_by(user_id=small).first().id
+        large_table = Table.query.filter_by(user_id=large).first().id
+
+    urls = (
+        '/restaurant/{restaurant}/orders/history',
+        '/api/orders/history?table_id={table}',
+        '/restaurant/orders/receipts'
+    )
+    for url in urls:
+        small_count = queries_for(app, small, url.format(restaurant=small, table=small_table))
+        large_count = queries_for(app, large, url.format(restaurant=large, table=large_table))
+        print(f"{url}: {small_count} queries for 1 order, {large_count} queries for 40 orders")
+
+        if small_count != large_count:
+            raise AssertionError(f"Query count of {url} grows with the number of orders")
+
+def check_order_pagination(app):
+    """Following next_cursor must walk every order exactly once."""
+    with app.app_context():
+        restaurant_id = seed_restaurant(25, status='completed')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(restaurant_id)
+        session['_fresh'] = True
+
+    seen = []
+    url = f'/restaurant/{restaurant_id}/orders/history?limit=10'
+    while url:
+        data = client.get(url).get_json()
+        seen.extend(order['id'] for order in data['orders'])
+        url = f"/restaurant/{restaurant_id}/orders/history?limit=10&cursor={data['next_cursor']}" if data['next_cursor'] else None
+    print(f"/restaurant/<slug>/orders/history: {len(seen)} orders over {-(-len(seen) // 10)} pages")
+
+    if len(seen) != 25 or len(set(seen)) != 25:
+        raise AssertionError("Paging through order history skipped or repeated orders")
+
+def check_active_orders_delta(app):
+    """?since= must return only the changed orders, at a constant query count."""
+    from models import Order
+
+    with app.app_context():
+        restaurant_id = seed_restaurant(30)
+        order_ids = [order.id for order in Order.query.filter_by(user_id=restaurant_id).order_by(Order.id)]
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(restaurant_id)
+        session['_fresh'] = True
+
+    board = client.get('/api/active-orders').get_json()
+    if not board['full'] or len(board['orders']) != 30:
+        raise AssertionError("The full order board is missing orders")
+
+    client.put(f'/api/orders/{order_ids[0]}/status', json={'status': 'preparing'})
+    client.put(f'/api/orders/{order_ids[1]}/status', json={'status': 'completed'})
+    url = f"/api/active-orders?since={board['version']}"
+    delta = client.get(url).get_json()
+    delta_count = queries_for(app, restaurant_id, url)
+    print(f"/api/active-orders?since=: {len(delta['orders'])} changed and {len(delta['removed'])} removed "
+          f"of 30 orders in {delta_count} queries")
+
+    if delta['full'] or [order['id'] for order in delta['orders']] != [order_ids[0]] or delta['removed'] != [order_ids[1]]:
+        raise AssertionError("The delta of /api/active-orders does not match the changes")
+    # Once the log no longer reaches back to the screen's version it gets everything
+    from utils.order_changes import prune_order_changes
+    with app.app_context():
+        prune_order_changes(days=-1)
+    if client.get(url).get_json()['full'] is not True:
+        raise AssertionError("A version older than the change log must get the full board")
+
+# Main execution
+if __name__ == "__main__":
+    app = create_check_app()
+
+    failed = False
+    for check in (check_active_orders, check_active_orders_delta, check_create_order, check_order_history,
+                  check_order_pagination):
+        try:
+            check(app)
+        except AssertionError as e:
+            print(f"FAILED {check.__name__}: {e}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+import multiprocessing
+
+# Start several server processes that share a SQLite database and a SQLite
+# Socket.IO message queue, connect a kitchen screen to each, place one order on
+# one of them and check that every screen gets the new_order event, that the
+# table presence is shared and that every worker can replay the event to its
+# screen when it rejoins. Usage: python check_socketio_queue.py [workers] [first port]
+
+def load_app(path, queue_path):
+    """Import the app bound to the shared database and message queue."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = f'sqlite:///{queue_path}'
+    os.environ['AI_BACKEND'] = 'stub'
+    logging.disable(logging.WARNING)
+
+    from app import app
+    return app
+
+def setup(path, queue_path):
+    """Create a restaurant with a table and a menu item."""
+    app = load_app(path, queue_path)
+    from models import db, User, Table, MenuItem
+
+    with app.app_context():
+        restaurant = User(name='Queue', email='queue@example.com', restaurant_name='Queue', slug='queue')
+        restaurant.set_password('queue')
+        db.session.add(restaurant)
+        db.session.flush()
+        table = Table(user_id=restaurant.id, number=1)
+        menu_item = MenuItem(name='Soup', price=6.0, category='Mains', user_id=restaurant.id)
+        db.session.add_all([table, menu_item])
+        db.session.commit()
+        return {'restaurant': restaurant.id, 'table': table.id, 'menu_item': menu_item.id}
+
+def serve(path, queue_path, port):
+    """One worker process serving HTTP and Socket.IO on its own port."""
+    app = load_app(path, queue_path)
+    from extensions import socketio
+
+    socketio.run(app, host='127.0.0.1', port=port, allow_unsafe_werkzeug=True, log_output=False)
+
+def wait_for(port, timeout=30):
+    import requests
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise SystemExit(f"Worker on port {port} did not start")
+
+def rejoin(screen, restaurant_id):
+    """Reconnect a screen to its worker with the last seq it saw; returns (replayed events, missed)."""
+    import socketio as socketio_client
+
+    client = socketio_client.Client()
+    replayed, joined = [], {}
+    client.on('new_order', lambda data: replayed.append(data))
+    client.on('room_joined', lambda data: joined.update(data))
+    client.connect(f"http://127.0.0.1:{screen['port']}", transports=['polling'])
+    client.emit('join_restaurant', {
+        'restaurant_id': restaurant_id,
+        'last_seq': screen['seq'] - 1,
+        'buffer_id': screen['buffer_id']
+    })
+    deadline = time.time() + 5
+    while time.time() < deadline and not joined:
+        time.sleep(0.01)
+    client.disconnect()
+    return replayed, joined.get('missed')
+
+def main():
+    import requests
+    import socketio as socketio_client
+    from utils.socket_queue import SQLitePresence
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    base_port = int(sys.argv[2]) if len(sys.argv) > 2 else 5301
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'check.db')
+        queue_path = os.path.join(directory, 'socketio.db')
+        with context.Pool(1) as pool:
+            ids = pool.apply(setup, (path, queue_path))
+
+        ports = [base_port + index for index in range(workers)]
+        processes = [context.Process(target=serve, args=(path, queue_path, port), daemon=True) for port in ports]
+        for process in processes:
+            process.start()
+        try:
+            for port in ports:
+                wait_for(port)
+
+            # One kitchen screen per worker, joined to the restaurant and table rooms
+            screens = [{'client': socketio_client.Client(), 'port': port, 'new_order': None} for port in ports]
+            for screen in screens:
+                def on_new_order(data, screen=screen):
+                    screen['new_order'] = time.perf_counter()
+                    screen['seq'] = data['seq']
+
+                def on_room_joined(data, screen=screen):
+                    screen['buffer_id'] = data['buffer_id']
+                screen['client'].on('new_order', on_new_order)
+                screen['client'].on('room_joined', on_room_joined)
+                screen['client'].connect(f"http://127.0.0.1:{screen['port']}", transports=['polling'])
+                screen['client'].emit('join_restaurant', {'restaurant_id': ids['restaurant']})
+                screen['client'].emit('join_table', {'table_id': ids['table']})
+            time.sleep(1)
+
+            table_members = len(SQLitePresence(f'sqlite:///{queue_path}').members(f"table_{ids['table']}"))
+            print(f"Shared presence: {table_members} sockets at the table across {workers} workers")
+
+            # Place the order on the last worker only
+            started = time.perf_counter()
+            response = requests.post(f'http://127.0.0.1:{ports[-1]}/api/orders', json={
+                'table_id': ids['table'],
+                'items': [{'id': ids['menu_item'], 'quantity': 1}]
+            })
+            if response.status_code != 201:
+                raise SystemExit(f"POST /api/orders returned {response.status_code}: {response.text}")
+            deadline = time.time() + 5
+            while time.time() < deadline and not all(screen['new_order'] for screen in screens):
+                time.sleep(0.01)
+
+            failed = table_members != workers
+            for screen in screens:
+                if screen['new_order']:
+                    print(f"worker on port {screen['port']}: new_order after {(screen['new_order'] - started) * 1000:.0f} ms")
+                else:
+                    print(f"worker on port {screen['port']}: new_order MISSING")
+                    failed = True
+                screen['client'].disconnect()
+
+            # Each worker buffered the event itself, so each can replay it
+            for screen in screens:
+                if not screen['new_order']:
+                    continue
+                replayed, missed = rejoin(screen, ids['restaurant'])
+                print(f"worker on port {screen['port']}: replayed {len(replayed)} event(s) on rejoin, missed={missed}")
+                failed = failed or len(replayed) != 1 or missed
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+
+    if failed:
+        raise SystemExit("Not every worker got the event or saw the shared presence")
+    print(f"All {workers} workers delivered the order placed on port {ports[-1]}")
+
+if __name__ == '__main__':
+    main()
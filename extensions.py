@@ -2,12 +2,19 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_socketio import SocketIO
+from utils.prometheus import SOCKETIO_EMITS
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
-socketio = SocketIO(cors_allowed_origins="*")
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO counting the events it emits, including emit() inside handlers."""
+    def emit(self, event, *args, **kwargs):
+        SOCKETIO_EMITS.labels(event).inc()
+        return super().emit(event, *args, **kwargs)
+
+socketio = InstrumentedSocketIO(cors_allowed_origins="*")
 
 # Initialize and configure Flask-Login
 login_manager.login_view = 'auth.login'
@@ -0,0 +1,41 @@
+"""Add order change log
+
+Revision ID: 2b7d5f0c8e61
+Revises: 9c2f4b6e8a13
+Create Date: 2026-10-18 17:05:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7d5f0c8e61'
+down_revision = '9c2f4b6e8a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Screens behind the first logged version just get the full list once
+    if sa.inspect(op.get_bind()).has_table('order_change'):
+        return  # already created by the app's db.create_all()
+    op.create_table('order_change',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'version', name='uq_order_change_user_id_version')
+    )
+    with op.batch_alter_table('order_change', schema=None) as batch_op:
+        batch_op.create_index('ix_order_change_changed_at', ['changed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_change', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_change_changed_at')
+
+    op.drop_table('order_change')
@@ -0,0 +1,66 @@
+"""Add slug to User model
+
+Revision ID: 3f6a1c2d9b47
+Revises: bbc280b7c60a
+Create Date: 2026-10-18 09:12:44.518302
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a1c2d9b47'
+down_revision = 'bbc280b7c60a'
+branch_labels = None
+depends_on = None
+
+
+def slugify(text):
+    # Same rules as routes.orders.slugify, copied so the migration doesn't import the app
+    text = text.lower().replace(' ', '-')
+    text = re.sub(r'[^a-z0-9-]', '', text)
+    text = re.sub(r'-+', '-', text)
+    return text
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('slug', sa.String(length=140), nullable=True))
+
+    # Backfill slugs, oldest restaurant first so it keeps the plain slug
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('restaurant_name', sa.String),
+        sa.column('slug', sa.String),
+    )
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(user.c.id, user.c.name, user.c.restaurant_name).order_by(user.c.id)
+    ).fetchall()
+
+    taken = set()
+    for row in rows:
+        base_slug = slugify(row.restaurant_name or row.name or '').strip('-') or 'restaurant'
+        if base_slug.isdigit():
+            base_slug = f'restaurant-{base_slug}'
+        slug = base_slug
+        suffix = 2
+        while slug in taken:
+            slug = f'{base_slug}-{suffix}'
+            suffix += 1
+        taken.add(slug)
+        connection.execute(user.update().where(user.c.id == row.id).values(slug=slug))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_slug'), ['slug'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_slug'))
+        batch_op.drop_column('slug')
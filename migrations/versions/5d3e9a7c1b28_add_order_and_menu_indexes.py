@@ -0,0 +1,60 @@
+"""Add composite indexes for order and menu queries
+
+Revision ID: 5d3e9a7c1b28
+Revises: a4c81e6f2d10
+Create Date: 2026-10-18 14:07:22.418306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d3e9a7c1b28'
+down_revision = 'a4c81e6f2d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tables the app's db.create_all() created have these indexes already
+    inspector = sa.inspect(op.get_bind())
+
+    def missing(table, name):
+        return name not in {index['name'] for index in inspector.get_indexes(table)}
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        if missing('orders', 'ix_orders_user_id_status_created_at'):
+            batch_op.create_index('ix_orders_user_id_status_created_at', ['user_id', 'status', 'created_at'], unique=False)
+        if missing('orders', 'ix_orders_user_id_created_at'):
+            batch_op.create_index('ix_orders_user_id_created_at', ['user_id', 'created_at'], unique=False)
+        if missing('orders', 'ix_orders_table_id_created_at'):
+            batch_op.create_index('ix_orders_table_id_created_at', ['table_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        if missing('order_item', 'ix_order_item_order_id'):
+            batch_op.create_index(batch_op.f('ix_order_item_order_id'), ['order_id'], unique=False)
+        if missing('order_item', 'ix_order_item_menu_item_id'):
+            batch_op.create_index(batch_op.f('ix_order_item_menu_item_id'), ['menu_item_id'], unique=False)
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        if missing('menu_item', 'ix_menu_item_user_id_is_available_category'):
+            batch_op.create_index('ix_menu_item_user_id_is_available_category', ['user_id', 'is_available', 'category'], unique=False)
+
+    # Give the query planner statistics for the new indexes
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade():
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_menu_item_user_id_is_available_category')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_menu_item_id'))
+        batch_op.drop_index(batch_op.f('ix_order_item_order_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_table_id_created_at')
+        batch_op.drop_index('ix_orders_user_id_created_at')
+        batch_op.drop_index('ix_orders_user_id_status_created_at')
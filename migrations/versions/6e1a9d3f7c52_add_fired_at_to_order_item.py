@@ -0,0 +1,28 @@
+"""Add fired_at to order items
+
+Revision ID: 6e1a9d3f7c52
+Revises: 2b7d5f0c8e61
+Create Date: 2026-10-18 18:21:09.837412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1a9d3f7c52'
+down_revision = '2b7d5f0c8e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fired_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Older databases have order_item referencing the legacy "order" table, whose own
+    # foreign key points at a table that doesn't exist, so don't follow foreign keys
+    with op.batch_alter_table('order_item', schema=None, reflect_kwargs={'resolve_fks': False}) as batch_op:
+        batch_op.drop_column('fired_at')
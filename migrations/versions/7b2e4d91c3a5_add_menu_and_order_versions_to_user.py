@@ -0,0 +1,28 @@
+"""Add menu_version and order_version to User model
+
+Revision ID: 7b2e4d91c3a5
+Revises: 3f6a1c2d9b47
+Create Date: 2026-10-18 11:52:07.630914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4d91c3a5'
+down_revision = '3f6a1c2d9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('menu_version', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('order_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('order_version')
+        batch_op.drop_column('menu_version')
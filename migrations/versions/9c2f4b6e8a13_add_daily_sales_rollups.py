@@ -0,0 +1,56 @@
+"""Add daily sales and item rollup tables
+
+Revision ID: 9c2f4b6e8a13
+Revises: 5d3e9a7c1b28
+Create Date: 2026-10-18 15:42:10.573912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2f4b6e8a13'
+down_revision = '5d3e9a7c1b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfill with `flask rebuild-rollups` after upgrading. Databases the app ran
+    # against before upgrading already got the tables from db.create_all()
+    if sa.inspect(op.get_bind()).has_table('daily_sales'):
+        return
+    op.create_table('daily_sales',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('sales_total', sa.Float(), nullable=False),
+        sa.Column('tax_total', sa.Float(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('rating_total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', name='uq_daily_sales_user_id_day')
+    )
+    op.create_table('daily_item_sales',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('menu_item_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('order_lines', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', 'menu_item_id', name='uq_daily_item_sales_user_id_day_menu_item_id')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_item_sales')
+    op.drop_table('daily_sales')
@@ -0,0 +1,40 @@
+"""Add job table for background jobs
+
+Revision ID: a4c81e6f2d10
+Revises: 7b2e4d91c3a5
+Create Date: 2026-10-18 12:31:45.102938
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c81e6f2d10'
+down_revision = '7b2e4d91c3a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app ran against before upgrading already got it from db.create_all()
+    if sa.inspect(op.get_bind()).has_table('job'):
+        return
+    op.create_table('job',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('progress', sa.Integer(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('job')
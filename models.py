@@ -2,6 +2,7 @@ from extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,6 +10,7 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     name = db.Column(db.String(120), nullable=False)
     restaurant_name = db.Column(db.String(120))
+    slug = db.Column(db.String(140), unique=True, index=True)  # URL slug for restaurant_name
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
     country = db.Column(db.String(2), default='US')  # Country code (ISO 2)
@@ -18,6 +20,10 @@ class User(UserMixin, db.Model):
     qr_code = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Change counters for the public menu and the order board (used for ETags and caches)
+    menu_version = db.Column(db.Integer, nullable=False, default=0)
+    order_version = db.Column(db.Integer, nullable=False, default=0)
+    
     # Relationships
     menu_items = db.relationship('MenuItem', backref='user', lazy=True)
     tables = db.relationship('Table', backref='user', lazy=True)
@@ -29,6 +35,29 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    @classmethod
+    def bump_menu_version(cls, user_id):
+        """Mark the restaurant's menu as changed, as part of the current transaction."""
+        db.session.execute(
+            db.update(cls).where(cls.id == user_id).values(menu_version=cls.menu_version + 1)
+        )
+
+    @classmethod
+    def bump_order_version(cls, user_id, order_id=None):
+        """
+        Mark the restaurant's orders as changed, as part of the current transaction.
+        Returns the new version and, given the changed order, logs it as an OrderChange.
+        """
+        statement = db.update(cls).where(cls.id == user_id).values(order_version=cls.order_version + 1)
+        if db.session.get_bind().dialect.update_returning:
+            version = db.session.execute(statement.returning(cls.order_version)).scalar_one()
+        else:
+            db.session.execute(statement)
+            version = db.session.execute(db.select(cls.order_version).where(cls.id == user_id)).scalar_one()
+        if order_id is not None:
+            db.session.execute(db.insert(OrderChange).values(user_id=user_id, version=version, order_id=order_id))
+        return version
+
 class MenuItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -45,6 +74,11 @@ class MenuItem(db.Model):
     # Relationships
     order_items = db.relationship('OrderItem', backref='menu_item', lazy=True)
 
+    __table_args__ = (
+        # Menu pages: a restaurant's available items, grouped by category
+        db.Index('ix_menu_item_user_id_is_available_category', 'user_id', 'is_available', 'category'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -153,6 +187,15 @@ class Order(db.Model):
     # Relationships
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Active orders and order history: a restaurant's orders in some statuses, newest first
+        db.Index('ix_orders_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        # Receipts: all of a restaurant's orders, newest first
+        db.Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+        # Table order history, newest first
+        db.Index('ix_orders_table_id_created_at', 'table_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Order {self.id}>'
 
@@ -160,19 +203,97 @@ class OrderItem(db.Model):
     __tablename__ = 'order_item'
     
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, default=1)
     unit_price = db.Column(db.Float, nullable=False)
     special_instructions = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    fired_at = db.Column(db.DateTime)  # set when the kitchen fires this line on its own
 
     def __repr__(self):
         return f'<OrderItem {self.id}>'
 
 class Feedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
     comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
+
+class Job(db.Model):
+    """Background job, e.g. extracting menu items from an uploaded image."""
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    progress = db.Column(db.Integer, default=0)  # percent
+    message = db.Column(db.Text)
+    result = db.Column(db.Text)  # JSON encoded result
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'result': json.loads(self.result) if self.result else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class DailySales(db.Model):
+    """Completed-order totals per restaurant and day, kept up to date by utils/rollups.py."""
+    __tablename__ = 'daily_sales'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC date the order was placed
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_total = db.Column(db.Float, nullable=False, default=0)
+    tax_total = db.Column(db.Float, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_total = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_daily_sales_user_id_day'),
+    )
+
+class DailyItemSales(db.Model):
+    """Completed-order quantities per restaurant, day and menu item, kept up to date by utils/rollups.py."""
+    __tablename__ = 'daily_item_sales'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC date the order was placed
+    menu_item_id = db.Column(db.Integer, nullable=False)  # no FK, rollups outlive deleted menu items
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50))
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    order_lines = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'menu_item_id', name='uq_daily_item_sales_user_id_day_menu_item_id'),
+    )
+
+class OrderChange(db.Model):
+    """Which order each User.order_version bump changed; lets order screens sync only what changed."""
+    __tablename__ = 'order_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)  # the restaurant's order_version after the change
+    order_id = db.Column(db.Integer, nullable=False)  # no FK, the log can outlive the order
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'version', name='uq_order_change_user_id_version'),
+        db.Index('ix_order_change_changed_at', 'changed_at'),
+    )
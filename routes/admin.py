@@ -1,46 +1,37 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
-from models import User, MenuItem, Order, Table, Feedback, db, OrderItem
+from models import User, MenuItem, Order, Table, Feedback, db, OrderItem, DailySales, DailyItemSales
 from datetime import datetime, timedelta
 import json
 from sqlalchemy import func
+from utils.traffic import get_traffic_heatmap, peak_hours
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/admin/dashboard')
 @login_required
 def dashboard():
-    # Get today's date range
+    # Today's sales and completed orders come from the daily rollup
     today = datetime.utcnow().date()
-    today_start = datetime.combine(today, datetime.min.time())
-    today_end = datetime.combine(today, datetime.max.time())
-    
-    # Get statistics
-    today_sales = db.session.query(func.sum(Order.total_amount)).filter(
-        Order.user_id == current_user.id,
-        Order.status == 'completed',
-        Order.created_at.between(today_start, today_end)
-    ).scalar() or 0.0
+    today_rollup = DailySales.query.filter_by(user_id=current_user.id, day=today).first()
+    today_sales = today_rollup.sales_total if today_rollup else 0.0
+    completed_orders = today_rollup.order_count if today_rollup else 0
     
     pending_orders = Order.query.filter(
         Order.user_id == current_user.id,
         Order.status.in_(['pending', 'preparing'])
     ).count()
     
-    completed_orders = Order.query.filter(
-        Order.user_id == current_user.id,
-        Order.status == 'completed',
-        Order.created_at.between(today_start, today_end)
-    ).count()
-    
-    # Get popular items
+    # Get popular items from the per-item rollup
     popular_items = db.session.query(
-        MenuItem.name,
-        func.sum(OrderItem.quantity).label('total_quantity')
-    ).join(OrderItem).filter(
-        MenuItem.user_id == current_user.id
-    ).group_by(MenuItem.id).order_by(
-        func.sum(OrderItem.quantity).desc()
+        func.max(DailyItemSales.name).label('name'),
+        func.sum(DailyItemSales.quantity).label('total_quantity')
+    ).filter(
+        DailyItemSales.user_id == current_user.id
+    ).group_by(DailyItemSales.menu_item_id).having(
+        func.sum(DailyItemSales.quantity) > 0
+    ).order_by(
+        func.sum(DailyItemSales.quantity).desc()
     ).limit(5).all()
     
     # Get recent feedback
@@ -75,50 +66,79 @@ def manage_tables():
     tables = Table.query.filter_by(user_id=current_user.id).all()
     return render_template('admin/tables.html', tables=tables)
 
-@admin_bp.route('/admin/analytics')
-@login_required
-def analytics():
+def get_analytics(restaurant_id):
+    """Last week's daily sales, popular categories, prep time and satisfaction from the rollups."""
     # Get date range (default: last 7 days)
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=7)
     
-    # Daily sales
+    # Daily sales from the daily rollup
     daily_sales = db.session.query(
-        func.date(Order.created_at).label('date'),
-        func.sum(Order.total_amount).label('total')
+        DailySales.day.label('date'),
+        DailySales.sales_total.label('total')
     ).filter(
-        Order.user_id == current_user.id,
-        Order.status == 'completed',
-        Order.created_at.between(start_date, end_date)
-    ).group_by(func.date(Order.created_at)).all()
+        DailySales.user_id == restaurant_id,
+        DailySales.day.between(start_date.date(), end_date.date()),
+        DailySales.order_count > 0
+    ).order_by(DailySales.day).all()
     
-    # Popular categories
+    # Popular categories from the per-item rollup
     popular_categories = db.session.query(
-        MenuItem.category,
-        func.count(OrderItem.id).label('total_orders')
-    ).join(OrderItem).filter(
-        MenuItem.user_id == current_user.id
-    ).group_by(MenuItem.category).order_by(
-        func.count(OrderItem.id).desc()
+        DailyItemSales.category,
+        func.sum(DailyItemSales.order_lines).label('total_orders')
+    ).filter(
+        DailyItemSales.user_id == restaurant_id
+    ).group_by(DailyItemSales.category).order_by(
+        func.sum(DailyItemSales.order_lines).desc()
     ).all()
     
     # Average preparation time
     avg_prep_time = db.session.query(
         func.avg(MenuItem.preparation_time).label('avg_time')
-    ).filter(MenuItem.user_id == current_user.id).scalar() or 0
+    ).filter(MenuItem.user_id == restaurant_id).scalar() or 0
     
-    # Customer satisfaction
-    satisfaction = db.session.query(
-        func.avg(Feedback.rating).label('avg_rating')
-    ).join(Order).filter(
-        Order.user_id == current_user.id
-    ).scalar() or 0
+    # Customer satisfaction from the ratings summed in the daily rollup
+    rating_count, rating_total = db.session.query(
+        func.sum(DailySales.rating_count),
+        func.sum(DailySales.rating_total)
+    ).filter(DailySales.user_id == restaurant_id).one()
+    satisfaction = rating_total / rating_count if rating_count else 0
     
-    return render_template('admin/analytics.html',
-                         daily_sales=daily_sales,
-                         popular_categories=popular_categories,
-                         avg_prep_time=avg_prep_time,
-                         satisfaction=satisfaction)
+    return {
+        'daily_sales': daily_sales,
+        'popular_categories': popular_categories,
+        'avg_prep_time': avg_prep_time,
+        'satisfaction': satisfaction
+    }
+
+@admin_bp.route('/admin/analytics')
+@login_required
+def analytics():
+    return render_template('admin/analytics.html', **get_analytics(current_user.id))
+
+@admin_bp.route('/admin/analytics/data')
+@login_required
+def analytics_data():
+    """The analytics page figures as JSON."""
+    figures = get_analytics(current_user.id)
+    return jsonify({
+        'success': True,
+        'daily_sales': [
+            {'date': row.date.isoformat(), 'total': round(row.total, 2)} for row in figures['daily_sales']
+        ],
+        'popular_categories': [
+            {'category': row.category, 'total_orders': int(row.total_orders)} for row in figures['popular_categories']
+        ],
+        'avg_prep_time': round(float(figures['avg_prep_time']), 1),
+        'satisfaction': round(float(figures['satisfaction']), 2)
+    })
+
+@admin_bp.route('/admin/analytics/traffic')
+@login_required
+def traffic_heatmap():
+    """Hour-of-week order counts, revenue and prep times for staff and kitchen planning."""
+    heatmap = get_traffic_heatmap(current_user.id)
+    return jsonify({'success': True, 'heatmap': heatmap, 'peak_hours': peak_hours(heatmap, limit=5)})
 
 @admin_bp.route('/admin/settings', methods=['GET', 'POST'])
 @login_required
@@ -126,8 +146,15 @@ def settings():
     if request.method == 'POST':
         try:
             data = request.form
+            new_email = data.get('email', current_user.email)
+            
+            # Changing the login email or password needs the current password
+            if (new_email != current_user.email or data.get('new_password')) and \
+                    not current_user.check_password(data.get('current_password') or ''):
+                return jsonify({'success': False, 'message': 'Current password is incorrect'}), 403
+            
             current_user.name = data.get('name', current_user.name)
-            current_user.email = data.get('email', current_user.email)
+            current_user.email = new_email
             current_user.phone = data.get('phone', current_user.phone)
             current_user.address = data.get('address', current_user.address)
             
@@ -185,22 +212,6 @@ def analyze_feedback():
         'total_feedback': feedback_data.total_feedback
     }
 
-def analyze_peak_hours():
-    # Analyze orders from the last 30 days
-    start_date = datetime.utcnow() - timedelta(days=30)
-    
-    peak_hours = db.session.query(
-        db.func.extract('hour', Order.created_at).label('hour'),
-        db.func.count(Order.id).label('order_count')
-    ).filter(
-        Order.created_at >= start_date
-    ).group_by(
-        db.func.extract('hour', Order.created_at)
-    ).order_by(
-        db.desc('order_count')
-    ).all()
-    
-    return [{
-        'hour': int(data.hour),
-        'order_count': data.order_count
-    } for data in peak_hours] 
\ No newline at end of file
+def analyze_peak_hours(restaurant_id):
+    """Busiest hours of the day for a restaurant, from its cached hour-of-week heatmap."""
+    return peak_hours(get_traffic_heatmap(restaurant_id))
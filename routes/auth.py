@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User
 from extensions import db
+from routes.orders import set_restaurant_slug
 import logging
 import traceback
 import sys
@@ -48,6 +49,7 @@ def register():
                 # Don't include phone and address until the database is updated
             )
             user.set_password(password)
+            set_restaurant_slug(user)
 
             # Save to database
             db.session.add(user)
@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from models import Job, db
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """Get the status and progress of a background job."""
+    job = db.session.get(Job, job_id)
+    if not job or job.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    
+    return jsonify({'success': True, 'job': job.to_dict()})
@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify, request
+from flask_login import login_required, current_user
+from utils.kitchen_queue import fire_next, get_kitchen_snapshot, serialize_ticket
+
+kitchen_bp = Blueprint('kitchen', __name__)
+
+@kitchen_bp.route('/api/kitchen/queue')
+@login_required
+def kitchen_queue():
+    """Get the restaurant's kitchen tickets in fire-by order with per-station load."""
+    snapshot = get_kitchen_snapshot(current_user.id)
+    station = request.args.get('station')
+    if station:
+        snapshot['tickets'] = [ticket for ticket in snapshot['tickets'] if ticket['station'] == station]
+    return jsonify({'success': True, **snapshot})
+
+@kitchen_bp.route('/api/kitchen/fire-next', methods=['POST'])
+@login_required
+def kitchen_fire_next():
+    """Fire the most urgent queued ticket, optionally for one station."""
+    data = request.get_json(silent=True) or {}
+    ticket = fire_next(current_user.id, station=data.get('station') or request.args.get('station'))
+    if ticket is None:
+        return jsonify({'success': False, 'message': 'No tickets waiting to be fired'}), 404
+    return jsonify({'success': True, 'ticket': serialize_ticket(ticket)})
@@ -4,12 +4,15 @@ from models import MenuItem, db, Table, User, MenuCategory
 from utils.ai_helper import analyze_menu_text, generate_item_description, analyze_menu_image
 import qrcode
 import os
-from PIL import Image
-import pytesseract
 from werkzeug.utils import secure_filename
 import json
+import uuid
 from datetime import datetime
-from routes.orders import get_restaurant_by_slug, slugify
+from extensions import socketio
+from routes.orders import get_restaurant_by_slug, restaurant_slug_for
+from utils.menu_cache import get_menu_snapshot, invalidate_menu_snapshot, get_menu_cache_stats
+from utils.http_cache import make_etag, not_modified, with_etag
+from utils.jobs import submit_job, update_job
 
 menu_bp = Blueprint('menu', __name__)
 
@@ -18,6 +21,11 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def menu_etag(restaurant, table):
+    """ETag for a rendered menu page, changes with the menu, the restaurant details or the table."""
+    return make_etag('menu', request.path, restaurant.id, restaurant.menu_version,
+                     table.id, table.number, current_user.get_id())
+
 @menu_bp.route('/menu/manage')
 @login_required
 def manage():
@@ -50,7 +58,9 @@ def add_item(restaurant_id):
         )
         
         db.session.add(menu_item)
+        User.bump_menu_version(restaurant_id)
         db.session.commit()
+        invalidate_menu_snapshot(restaurant_id)
         
         return jsonify({'success': True, 'message': 'Menu item added successfully'})
     except Exception as e:
@@ -77,7 +87,9 @@ def update_item(restaurant_id, item_id):
         menu_item.preparation_time = int(data.get('preparation_time', menu_item.preparation_time))
         menu_item.is_available = data.get('is_available', menu_item.is_available)
         
+        User.bump_menu_version(restaurant_id)
         db.session.commit()
+        invalidate_menu_snapshot(restaurant_id)
         return jsonify({'success': True, 'message': 'Menu item updated successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -96,7 +108,9 @@ def delete_item(restaurant_id, item_id):
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
         
         db.session.delete(menu_item)
+        User.bump_menu_version(restaurant_id)
         db.session.commit()
+        invalidate_menu_snapshot(restaurant_id)
         return jsonify({'success': True, 'message': 'Menu item deleted successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -120,45 +134,72 @@ def upload_menu(restaurant_id):
         if not allowed_file(file.filename):
             return jsonify({'success': False, 'message': 'Invalid file type. Please upload a PNG or JPG image.'}), 400
         
-        # Save the file temporarily
-        filename = secure_filename(file.filename)
+        # Save the file under a unique name so concurrent uploads don't clash
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
+        # Extract the menu in the background and hand the job id back right away
+        job_id = submit_job('menu_upload', restaurant_id, extract_menu_job, restaurant_id, filepath)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Menu uploaded! Extracting items in the background...',
+            'job_id': job_id,
+            'status_url': url_for('jobs.job_status', job_id=job_id)
+        }), 202
+    except Exception as e:
+        print(f"Error in menu upload: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+def extract_menu_job(job_id, restaurant_id, filepath):
+    """Background job: extract menu items from an uploaded image and save them."""
+    try:
         # Analyze menu image with Gemini Vision
+        update_job(job_id, progress=10, message='Extracting menu items from image')
         menu_items = analyze_menu_image(filepath)
         if not menu_items:
-            return jsonify({'success': False, 'message': 'Could not extract menu items from image'}), 400
+            raise ValueError('Could not extract menu items from image')
         
         # Add items to database
-        added_items = []
+        update_job(job_id, progress=80, message=f'Saving {len(menu_items)} menu items')
+        new_items = []
         for item in menu_items:
             menu_item = MenuItem(
                 name=item['name'],
-                description=item['description'],
+                description=item.get('description'),
                 price=float(item['price']),
                 currency=item.get('currency', 'USD'),
-                category=item['category'],
-                preparation_time=int(item['preparation_time']),
+                category=item.get('category'),
+                preparation_time=int(item.get('preparation_time') or 15),
                 image_url=item.get('image_url'),
                 user_id=restaurant_id
             )
             db.session.add(menu_item)
-            added_items.append(menu_item.to_dict())
+            new_items.append(menu_item)
         
+        User.bump_menu_version(restaurant_id)
         db.session.commit()
+        invalidate_menu_snapshot(restaurant_id)
         
-        # Clean up the temporary file
-        os.remove(filepath)
+        added_items = [menu_item.to_dict() for menu_item in new_items]
         
-        return jsonify({
-            'success': True, 
-            'message': f'Menu uploaded successfully! Added {len(menu_items)} items.',
+        # Let the menu management page know the items are in
+        socketio.emit('menu_items_added', {
+            'job_id': job_id,
+            'restaurant_id': restaurant_id,
+            'count': len(added_items),
             'items': added_items
-        })
-    except Exception as e:
-        print(f"Error in menu upload: {e}")
-        return jsonify({'success': False, 'message': str(e)}), 400
+        }, room=f"restaurant_{restaurant_id}")
+        
+        return {
+            'message': f'Menu uploaded successfully! Added {len(added_items)} items.',
+            'items': added_items
+        }
+    finally:
+        # Clean up the temporary file
+        if os.path.exists(filepath):
+            os.remove(filepath)
 
 # Keep the original routes as redirects for backward compatibility
 @menu_bp.route('/menu/add', methods=['POST'])
@@ -199,39 +240,21 @@ def view_menu(table_id):
         # Get the restaurant owner's information
         restaurant = User.query.get_or_404(table.user_id)
         
-        # Get all available menu items for this restaurant
-        menu_items = MenuItem.query.filter_by(
-            user_id=restaurant.id,
-            is_available=True
-        ).all()
+        # Answer with 304 if the guest already has this version of the menu
+        etag = menu_etag(restaurant, table)
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
         
-        # Group menu items by category
-        categories = {}
-        for item in menu_items:
-            category = item.category or 'Uncategorized'
-            if category not in categories:
-                categories[category] = {
-                    'id': len(categories) + 1,
-                    'name': category,
-                    'menu_items': []
-                }
-            # Convert MenuItem object to dictionary for JSON serialization
-            item_dict = item.to_dict()
-            # Add reference to the original id for the template
-            item_dict['original_id'] = item.id
-            categories[category]['menu_items'].append(item_dict)
-        
-        # Sort categories and menu items
-        sorted_categories = sorted(categories.values(), key=lambda x: x['name'])
-        for category in sorted_categories:
-            category['menu_items'].sort(key=lambda x: x['name'])
+        # Get the categorized menu from the snapshot cache
+        sorted_categories = get_menu_snapshot(restaurant.id, restaurant.menu_version)
         
         current_app.logger.info(f"Rendering menu for table ID: {table.id}, number: {table.number}")
         
-        return render_template('menu/view.html',
+        return with_etag(render_template('menu/view.html',
                              restaurant=restaurant,
                              table=table,
-                             categories=sorted_categories)
+                             categories=sorted_categories), etag)
         
     except Exception as e:
         current_app.logger.error(f"Error viewing menu: {e}")
@@ -306,32 +329,14 @@ def view_menu_with_restaurant(restaurant_slug, table_id):
         if table.user_id != restaurant.id:
             return render_template('error.html', message="Invalid table for this restaurant")
             
-        # Get all available menu items for this restaurant
-        menu_items = MenuItem.query.filter_by(
-            user_id=restaurant.id,
-            is_available=True
-        ).all()
-        
-        # Group menu items by category
-        categories = {}
-        for item in menu_items:
-            category = item.category or 'Uncategorized'
-            if category not in categories:
-                categories[category] = {
-                    'id': len(categories) + 1,
-                    'name': category,
-                    'menu_items': []
-                }
-            # Convert MenuItem object to dictionary for JSON serialization
-            item_dict = item.to_dict()
-            # Add reference to the original id for the template
-            item_dict['original_id'] = item.id
-            categories[category]['menu_items'].append(item_dict)
-        
-        # Sort categories and menu items
-        sorted_categories = sorted(categories.values(), key=lambda x: x['name'])
-        for category in sorted_categories:
-            category['menu_items'].sort(key=lambda x: x['name'])
+        # Answer with 304 if the guest already has this version of the menu
+        etag = menu_etag(restaurant, table)
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        
+        # Get the categorized menu from the snapshot cache
+        sorted_categories = get_menu_snapshot(restaurant.id, restaurant.menu_version)
         
         # Get restaurant data
         restaurant_data = {
@@ -343,12 +348,12 @@ def view_menu_with_restaurant(restaurant_slug, table_id):
         
         current_app.logger.info(f"Rendering menu for table ID: {table.id}, number: {table.number}")
         
-        return render_template(
+        return with_etag(render_template(
             'menu/view.html',
             restaurant=restaurant_data,
             categories=sorted_categories,
             table=table  # Pass the complete table object
-        )
+        ), etag)
         
     except Exception as e:
         current_app.logger.error(f"Error viewing menu: {str(e)}")
@@ -407,32 +412,14 @@ def view_menu_by_slug(restaurant_slug, table_id):
         if table.user_id != restaurant.id:
             return render_template('error.html', message="Invalid table for this restaurant")
             
-        # Get all available menu items for this restaurant
-        menu_items = MenuItem.query.filter_by(
-            user_id=restaurant.id,
-            is_available=True
-        ).all()
-        
-        # Group menu items by category
-        categories = {}
-        for item in menu_items:
-            category = item.category or 'Uncategorized'
-            if category not in categories:
-                categories[category] = {
-                    'id': len(categories) + 1,
-                    'name': category,
-                    'menu_items': []
-                }
-            # Convert MenuItem object to dictionary for JSON serialization
-            item_dict = item.to_dict()
-            # Add reference to the original id for the template
-            item_dict['original_id'] = item.id
-            categories[category]['menu_items'].append(item_dict)
-        
-        # Sort categories and menu items
-        sorted_categories = sorted(categories.values(), key=lambda x: x['name'])
-        for category in sorted_categories:
-            category['menu_items'].sort(key=lambda x: x['name'])
+        # Answer with 304 if the guest already has this version of the menu
+        etag = menu_etag(restaurant, table)
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        
+        # Get the categorized menu from the snapshot cache
+        sorted_categories = get_menu_snapshot(restaurant.id, restaurant.menu_version)
         
         # Get restaurant data
         restaurant_data = {
@@ -446,13 +433,13 @@ def view_menu_by_slug(restaurant_slug, table_id):
         
         current_app.logger.info(f"Rendering menu for table ID: {table.id}, number: {table.number}")
         
-        return render_template(
+        return with_etag(render_template(
             'menu/view.html',
             restaurant=restaurant_data,
             categories=sorted_categories,
             table=table,
             restaurant_slug=restaurant_slug
-        )
+        ), etag)
         
     except Exception as e:
         current_app.logger.error(f"Error viewing menu: {str(e)}")
@@ -480,12 +467,17 @@ def view_menu_by_id(table_id):
             return render_template('error.html', message="Restaurant not found")
             
         # Generate slug
-        restaurant_name = restaurant.restaurant_name or restaurant.name
-        restaurant_slug = slugify(restaurant_name)
+        restaurant_slug = restaurant_slug_for(restaurant)
         
         # Redirect to slug-based URL
         return redirect(url_for('menu.view_menu_by_slug', restaurant_slug=restaurant_slug, table_id=table_id))
         
     except Exception as e:
         current_app.logger.error(f"Error redirecting to menu: {str(e)}")
-        return render_template('error.html', message="An error occurred while loading the menu") 
\ No newline at end of file
+        return render_template('error.html', message="An error occurred while loading the menu") 
+
+@menu_bp.route('/api/menu/cache-stats')
+@login_required
+def menu_cache_stats():
+    """Get hit/miss counters for the menu snapshot cache."""
+    return jsonify({'success': True, 'stats': get_menu_cache_stats()})
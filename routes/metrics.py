@@ -0,0 +1,38 @@
+import os
+import hmac
+
+from flask import Blueprint, Response, jsonify, current_app, request, abort
+from flask_login import login_required
+from extensions import db
+from utils.db_pool import get_pool_stats
+from utils.request_timing import get_endpoint_stats, SLOW_REQUEST_MS
+from utils.prometheus import render_metrics
+
+# Bearer token Prometheus must send to scrape /metrics; unset leaves it open
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/api/metrics/db-pool')
+@login_required
+def db_pool_metrics():
+    """Get connection pool settings, state and counters for this worker process."""
+    options = {
+        name: value for name, value in current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).items()
+        if name != 'poolclass'
+    }
+    return jsonify({'success': True, 'options': options, 'pool': get_pool_stats(db.engine)})
+
+@metrics_bp.route('/api/metrics/requests')
+@login_required
+def request_metrics():
+    """Get latency, query count, DB and template time per endpoint for this worker process."""
+    return jsonify({'success': True, 'slow_request_ms': SLOW_REQUEST_MS, 'endpoints': get_endpoint_stats()})
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint: HTTP, SQL, Socket.IO and AI call metrics of all workers."""
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        abort(401)
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
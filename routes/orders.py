@@ -1,10 +1,20 @@
 from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import Order, OrderItem, MenuItem, Table, Feedback, db, User
-from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import datetime, timedelta
+import base64
 import json
+import math
 import re
-from extensions import socketio
+from utils.http_cache import make_etag, not_modified, with_etag
+from utils.sqlite_profile import retry_on_locked, is_database_locked
+from utils.rollups import update_rollups_for_status, apply_feedback
+from utils.prep_time import estimate_order_minutes, get_prep_model_stats
+from utils import kitchen_queue
+from utils.socket_batch import queue_order_notification
+from utils.order_changes import changed_order_ids
 
 orders = Blueprint('orders', __name__)
 
@@ -18,6 +28,37 @@ def slugify(text):
     text = re.sub(r'-+', '-', text)
     return text
 
+# Restaurant slug -> user id, kept per process and invalidated on rename
+restaurant_slug_cache = {}
+
+def restaurant_slug_for(restaurant):
+    """Get the URL slug for a restaurant."""
+    return restaurant.slug or slugify(restaurant.restaurant_name or restaurant.name)
+
+def set_restaurant_slug(restaurant):
+    """Assign a unique slug from the restaurant name and invalidate the old one."""
+    base_slug = slugify(restaurant.restaurant_name or restaurant.name or '').strip('-') or 'restaurant'
+    # Purely numeric slugs would be taken for restaurant IDs
+    if base_slug.isdigit():
+        base_slug = f'restaurant-{base_slug}'
+    
+    # Find slugs already taken by other restaurants in a single query
+    query = User.query.with_entities(User.slug).filter(User.slug.like(f'{base_slug}%'))
+    if restaurant.id is not None:
+        query = query.filter(User.id != restaurant.id)
+    taken = {row.slug for row in query}
+    
+    slug = base_slug
+    suffix = 2
+    while slug in taken:
+        slug = f'{base_slug}-{suffix}'
+        suffix += 1
+    
+    if restaurant.slug != slug:
+        restaurant_slug_cache.pop(restaurant.slug, None)
+        restaurant.slug = slug
+    return slug
+
 def get_restaurant_by_slug(slug):
     """Get restaurant by slug."""
     # First try direct ID match for backward compatibility
@@ -27,14 +68,94 @@ def get_restaurant_by_slug(slug):
     except ValueError:
         pass
     
-    # Then try to match by slugified name
-    all_restaurants = User.query.all()
-    for restaurant in all_restaurants:
-        restaurant_name = restaurant.restaurant_name or restaurant.name
-        if slugify(restaurant_name) == slug:
+    # Then try the slug cache, making sure the restaurant wasn't renamed by another worker
+    restaurant_id = restaurant_slug_cache.get(slug)
+    if restaurant_id is not None:
+        restaurant = db.session.get(User, restaurant_id)
+        if restaurant and restaurant.slug == slug:
             return restaurant
+        restaurant_slug_cache.pop(slug, None)
+    
+    # Finally look it up by the indexed slug column
+    restaurant = User.query.filter_by(slug=slug).first()
+    if restaurant:
+        restaurant_slug_cache[slug] = restaurant.id
+    return restaurant
+
+# Page sizes for order listings
+ACTIVE_ORDER_STATUSES = ('pending', 'preparing', 'ready')  # orders shown on the order board
+ORDER_PAGE_SIZE = 50
+MAX_ORDER_PAGE_SIZE = 200
+
+def eager_order_query():
+    """Order query that loads each order's table, items and menu items up front."""
+    return Order.query.options(
+        joinedload(Order.assigned_table),
+        selectinload(Order.items).joinedload(OrderItem.menu_item)
+    )
+
+def project_order(order):
+    """Serialize an order loaded with eager_order_query() for JSON listings."""
+    items = []
+    for item in order.items:
+        items.append({
+            'id': item.id,
+            'menu_item_id': item.menu_item_id,
+            'name': item.menu_item.name if item.menu_item else 'Unknown',
+            'quantity': item.quantity,
+            'unit_price': float(item.unit_price),
+            'price': float(item.unit_price)
+        })
     
-    return None
+    created_at = order.created_at.isoformat()
+    return {
+        'id': order.id,
+        'table_id': order.table_id,
+        'table_number': order.assigned_table.number if order.assigned_table else 'Unknown',
+        'status': order.status,
+        'customer_name': order.customer_name,
+        'customer_phone': order.customer_phone,
+        'payment_method': order.payment_method,
+        'payment_status': order.payment_status,
+        'special_instructions': order.special_instructions,
+        'items': items,
+        'total_items': sum(item['quantity'] for item in items),
+        'total_amount': float(order.total_amount) if order.total_amount else 0,
+        'tax_amount': float(order.tax_amount) if order.tax_amount else 0,
+        'final_amount': float(order.final_amount) if order.final_amount else 0,
+        'created_at': created_at,
+        'updated_at': order.updated_at.isoformat() if order.updated_at else created_at,
+        'completed_at': order.completed_at.isoformat() if order.completed_at else None
+    }
+
+def encode_order_cursor(order):
+    """Opaque cursor for the position right after this order."""
+    position = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+def decode_order_cursor(cursor):
+    """Get the (created_at, id) position from a cursor; raises ValueError if it is malformed."""
+    position = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_at, order_id = position.rsplit('|', 1)
+    return datetime.fromisoformat(created_at), int(order_id)
+
+def order_page_args():
+    """Read the cursor and limit of a paginated order listing from the query string."""
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', ORDER_PAGE_SIZE, type=int)
+    after = decode_order_cursor(cursor) if cursor else None
+    return after, max(1, min(limit, MAX_ORDER_PAGE_SIZE))
+
+def paginate_orders(query, after=None, limit=ORDER_PAGE_SIZE):
+    """
+    Get one page of orders, newest first by (created_at, id), using keyset pagination.
+    Returns the orders and the cursor for the next page, or None on the last page.
+    """
+    if after:
+        query = query.filter(tuple_(Order.created_at, Order.id) < after)
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_order_cursor(orders[limit - 1]) if len(orders) > limit else None
+    return orders[:limit], next_cursor
 
 @orders.route('/restaurant/<restaurant_slug>/orders')
 @login_required
@@ -60,7 +181,7 @@ def orders_page(restaurant_slug):
     ).order_by(Order.created_at.desc()).limit(10).all()
     
     restaurant_name = restaurant.restaurant_name or restaurant.name
-    restaurant_slug = slugify(restaurant_name)
+    restaurant_slug = restaurant_slug_for(restaurant)
     
     return render_template(
         'orders.html', 
@@ -90,7 +211,7 @@ def restaurant_menu(restaurant_slug):
     menu_items_json = [item.to_dict() for item in menu_items]
     
     restaurant_name = restaurant.restaurant_name or restaurant.name
-    restaurant_slug = slugify(restaurant_name)
+    restaurant_slug = restaurant_slug_for(restaurant)
     
     return render_template(
         'menu/manage.html',
@@ -107,8 +228,7 @@ def restaurant_menu(restaurant_slug):
 def orders_page_by_id(restaurant_id):
     """Redirect to slug-based URL."""
     restaurant = User.query.get_or_404(restaurant_id)
-    restaurant_name = restaurant.restaurant_name or restaurant.name
-    restaurant_slug = slugify(restaurant_name)
+    restaurant_slug = restaurant_slug_for(restaurant)
     return redirect(url_for('orders.orders_page', restaurant_slug=restaurant_slug))
 
 # Route for backward compatibility
@@ -117,62 +237,74 @@ def orders_page_by_id(restaurant_id):
 def restaurant_menu_by_id(restaurant_id):
     """Redirect to slug-based URL."""
     restaurant = User.query.get_or_404(restaurant_id)
-    restaurant_name = restaurant.restaurant_name or restaurant.name
-    restaurant_slug = slugify(restaurant_name)
+    restaurant_slug = restaurant_slug_for(restaurant)
     return redirect(url_for('orders.restaurant_menu', restaurant_slug=restaurant_slug))
     
 @orders.route('/create', methods=['POST'])
+@orders.route('/api/orders', methods=['POST'])
+@retry_on_locked
 def create_order():
+    """Place a guest order for a table, looking up all menu items in one query."""
     data = request.json
     if not data:
-        return jsonify({'error': 'No data provided'}), 400
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
     
-    # Check if table exists
-    table_id = data.get('table_id')
-    table = Table.query.get(table_id)
+    # Check if table exists - the order belongs to the table's restaurant
+    table = Table.query.get(data.get('table_id'))
     if not table:
-        return jsonify({'error': 'Table not found'}), 404
+        return jsonify({'success': False, 'error': 'Table not found'}), 404
     
-    # Get current user
-    current_user = User.query.get(session.get('user_id'))
-    if not current_user:
-        return jsonify({'error': 'User not authenticated'}), 401
+    # Validate the requested lines before touching the menu
+    lines = []
+    for item_data in data.get('items', []):
+        try:
+            menu_item_id = int(item_data.get('id'))
+            quantity = int(item_data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid order item'}), 400
+        if quantity <= 0:
+            return jsonify({'success': False, 'error': 'Quantity must be positive'}), 400
+        lines.append((menu_item_id, quantity, item_data.get('special_instructions')))
+    
+    if not lines:
+        return jsonify({'success': False, 'error': 'Your order has no items'}), 400
+    
+    # Fetch every referenced menu item with a single IN query
+    menu_item_ids = {menu_item_id for menu_item_id, _, _ in lines}
+    menu_items = {
+        menu_item.id: menu_item
+        for menu_item in MenuItem.query.filter(MenuItem.id.in_(menu_item_ids)).all()
+    }
     
     # Create order
     order = Order(
-        user_id=current_user.id,
-        table_id=table_id,
+        user_id=table.user_id,
+        table_id=table.id,
         payment_method=data.get('payment_method', 'later'),
         special_instructions=data.get('special_instructions', ''),
         customer_name=data.get('customer_name', ''),
         customer_phone=data.get('customer_phone', '')
     )
     
-    db.session.add(order)
-    db.session.flush()  # Get order ID
-    
-    # Add order items
-    items = data.get('items', [])
+    # Validate each item and compute the totals in the same pass
     total_amount = 0
-    
-    for item_data in items:
-        menu_item = MenuItem.query.get(item_data.get('id'))
-        if not menu_item:
-            continue
+    menu_minutes = 0
+    order_items = []
+    for menu_item_id, quantity, special_instructions in lines:
+        menu_item = menu_items.get(menu_item_id)
+        if not menu_item or menu_item.user_id != table.user_id:
+            return jsonify({'success': False, 'error': f'Menu item {menu_item_id} is not on this menu'}), 400
+        if not menu_item.is_available:
+            return jsonify({'success': False, 'error': f'{menu_item.name} is currently unavailable'}), 400
         
-        quantity = item_data.get('quantity', 1)
-        price = menu_item.price
-        subtotal = price * quantity
-        total_amount += subtotal
-        
-        order_item = OrderItem(
-            order_id=order.id,
-            menu_item_id=menu_item.id,
-            quantity=quantity,
-            price=price,
-            subtotal=subtotal
-        )
-        db.session.add(order_item)
+        total_amount += menu_item.price * quantity
+        menu_minutes += (menu_item.preparation_time or 0) * quantity
+        order_items.append({
+            'menu_item_id': menu_item.id,
+            'quantity': quantity,
+            'unit_price': menu_item.price,
+            'special_instructions': special_instructions
+        })
     
     # Calculate totals
     order.total_amount = total_amount
@@ -185,20 +317,60 @@ def create_order():
         # For demo, we'll just mark it as paid
         order.payment_status = 'paid'
     
+    db.session.add(order)
+    db.session.flush()  # Get order ID
+    
+    # Bulk-insert all order items with a single executemany
+    for order_item in order_items:
+        order_item['order_id'] = order.id
+    db.session.execute(db.insert(OrderItem), order_items)
+    
+    version = User.bump_order_version(order.user_id, order.id)
     db.session.commit()
     
+    current_app.logger.info(f"Order #{order.id} placed for table {table.number} with {len(lines)} items")
+    
+    # Let the kitchen know about the new order
+    try:
+        from routes.socket_notifications import notify_restaurant_new_order
+        notify_restaurant_new_order(order, version=version)
+    except Exception as notification_error:
+        current_app.logger.error(f"Error sending notification for new order: {notification_error}")
+    
+    # Put its tickets on the kitchen display queue; a queue that misses it reloads on its next use
+    try:
+        kitchen_queue.add_order(order, version, table_number=table.number)
+    except Exception as kitchen_error:
+        current_app.logger.error(f"Error queueing order #{order.id} for the kitchen: {kitchen_error}")
+    
     # Generate receipt URL
     receipt_url = url_for('orders.order_receipt', order_id=order.id, _external=True)
     
-    flash('Order created successfully!', 'success')
+    # Estimate when it will be ready from the restaurant's prep time model; the order
+    # is placed either way, so a failed estimate only leaves it out
+    try:
+        estimated_minutes = estimate_order_minutes(
+            order,
+            menu_minutes=menu_minutes,
+            item_count=sum(quantity for _, quantity, _ in lines)
+        )
+    except Exception as estimate_error:
+        current_app.logger.error(f"Error estimating prep time for order #{order.id}: {estimate_error}")
+        estimated_minutes = None
+    
     return jsonify({
         'success': True,
         'order_id': order.id,
+        'total_amount': order.total_amount,
+        'tax_amount': order.tax_amount,
+        'final_amount': order.final_amount,
+        'estimated_minutes': estimated_minutes,
         'receipt_url': receipt_url
     }), 201
 
 @orders.route('/api/orders/<int:order_id>/status', methods=['PUT'])
 @login_required
+@retry_on_locked
 def update_order_status(order_id):
     """Update the status of an order."""
     data = request.json
@@ -236,19 +408,29 @@ def update_order_status(order_id):
     if new_status == 'completed' and not order.completed_at:
         order.completed_at = datetime.utcnow()
         
+    # Keep the dashboard sales rollups in step, in the same transaction
+    update_rollups_for_status(order, old_status, new_status)
+        
     # Save the order to the database
+    version = User.bump_order_version(order.user_id, order.id)
     db.session.commit()
     
     # Log the status update
     current_app.logger.info(f"Order #{order.id} status updated from '{old_status}' to '{new_status}'")
     
+    # Keep the kitchen display queue in step; a queue that misses it reloads on its next use
+    try:
+        kitchen_queue.update_order(order, new_status, version)
+    except Exception as kitchen_error:
+        current_app.logger.error(f"Error updating the kitchen queue for order #{order.id}: {kitchen_error}")
+    
     # Send notifications via Socket.IO
     try:
         # Import notification functions
         from routes.socket_notifications import notify_restaurant_order_status, notify_customer_order_status
         
         # Notify restaurant about status change
-        notify_restaurant_order_status(order, new_status, old_status)
+        notify_restaurant_order_status(order, new_status, old_status, version=version)
         
         # Notify customer about status change
         notify_customer_order_status(order, new_status, old_status)
@@ -265,58 +447,60 @@ def update_order_status(order_id):
 @orders.route('/api/active-orders')
 @login_required
 def get_active_orders():
-    """Get active orders for the restaurant."""
+    """
+    Get active orders for the restaurant. With ?since=<version> only the orders
+    changed after that version are sent: active ones in 'orders', the ones that
+    left the board in 'removed'. 'full' tells the client which it got.
+    """
     try:
-        # Query active orders
-        active_orders = Order.query.filter(
-            Order.user_id == current_user.id,
-            Order.status.in_(['pending', 'preparing', 'ready'])
-        ).order_by(Order.created_at.desc()).all()
+        since = request.args.get('since', type=int)
+        
+        # Answer with 304 if the screen already has the current order board
+        etag = make_etag('active-orders', current_user.id, current_user.order_version, current_user.menu_version, since)
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        
+        if since is not None:
+            changed_ids, version = changed_order_ids(current_user.id, since, current_user.order_version)
+            if changed_ids is not None:
+                changed_orders = eager_order_query().filter(
+                    Order.user_id == current_user.id, Order.id.in_(changed_ids)
+                ).all() if changed_ids else []
+                active = [order for order in changed_orders if order.status in ACTIVE_ORDER_STATUSES]
+                active_ids = {order.id for order in active}
+                return with_etag(jsonify({
+                    'success': True,
+                    'full': False,
+                    'version': version,
+                    'orders': [project_order(order) for order in active],
+                    'removed': sorted(changed_ids - active_ids)
+                }), etag)
+            # The change log doesn't reach back that far, send everything
+        
+        # Query active orders with their table, items and menu items in a
+        # fixed number of round trips (orders + tables, then items + menu items).
+        # There are only a few active orders, so they are sorted here: an ORDER BY
+        # makes the database walk the restaurant's whole order history by date
+        # instead of seeking to the active statuses.
+        active_orders = sorted(
+            eager_order_query().filter(
+                Order.user_id == current_user.id,
+                Order.status.in_(ACTIVE_ORDER_STATUSES)
+            ).all(),
+            key=lambda order: (order.created_at, order.id),
+            reverse=True
+        )
         
         # Format orders for JSON response
-        orders_data = []
-        for order in active_orders:
-            # Get table number
-            table_number = "Unknown"
-            if order.table:
-                table_number = order.table.number
-                
-            # Format order items
-            items = []
-            for item in order.items:
-                menu_item_name = "Unknown"
-                if item.menu_item:
-                    menu_item_name = item.menu_item.name
-                    
-                items.append({
-                    'id': item.id,
-                    'name': menu_item_name,
-                    'quantity': item.quantity,
-                    'unit_price': float(item.unit_price)
-                })
-                
-            # Add order to response
-            orders_data.append({
-                'id': order.id,
-                'table_id': order.table_id,
-                'table_number': table_number,
-                'status': order.status,
-                'customer_phone': order.customer_phone,
-                'payment_method': order.payment_method,
-                'payment_status': order.payment_status,
-                'special_instructions': order.special_instructions,
-                'items': items,
-                'total_amount': float(order.total_amount) if order.total_amount else 0,
-                'tax_amount': float(order.tax_amount) if order.tax_amount else 0,
-                'final_amount': float(order.final_amount) if order.final_amount else 0,
-                'created_at': order.created_at.isoformat(),
-                'updated_at': order.updated_at.isoformat()
-            })
+        orders_data = [project_order(order) for order in active_orders]
             
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
+            'full': True,
+            'version': current_user.order_version,
             'orders': orders_data
-        })
+        }), etag)
         
     except Exception as e:
         current_app.logger.error(f"Error getting active orders: {e}")
@@ -336,50 +520,34 @@ def get_order_history(restaurant_slug):
         return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
         
     try:
-        # Use updated_at or created_at for sorting instead of completed_at
-        completed_orders = Order.query.filter(
-            Order.user_id == restaurant.id,
-            Order.status.in_(['completed', 'cancelled'])
-        ).order_by(Order.updated_at.desc()).all()
+        after, limit = order_page_args()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        
+    try:
+        completed_orders, next_cursor = paginate_orders(
+            eager_order_query().filter(
+                Order.user_id == restaurant.id,
+                Order.status.in_(['completed', 'cancelled'])
+            ),
+            after, limit
+        )
         
         orders_data = []
         for order in completed_orders:
-            total_amount = 0
-            items = []
-            
-            for item in order.items:
-                menu_item = MenuItem.query.get(item.menu_item_id)
-                item_total = float(item.unit_price) * item.quantity
-                total_amount += item_total
-                
-                items.append({
-                    'id': item.id,
-                    'name': menu_item.name,
-                    'quantity': item.quantity,
-                    'price': float(item.unit_price)
-                })
-            
-            # Get table number
-            table_number = order.table.number if order.table else 'Unknown'
-            
-            orders_data.append({
-                'id': order.id,
-                'table_id': order.table_id,
-                'table_number': table_number,
-                'status': order.status,
-                'total_amount': total_amount,
-                'created_at': order.created_at.isoformat(),
-                'updated_at': order.updated_at.isoformat() if order.updated_at else order.created_at.isoformat(),
-                'completed_at': order.completed_at.isoformat() if order.completed_at else order.updated_at.isoformat(),
-                'items': items
-            })
+            order_data = project_order(order)
+            # History shows the item total and falls back to the last update for completion
+            order_data['total_amount'] = sum(item['price'] * item['quantity'] for item in order_data['items'])
+            order_data['completed_at'] = order_data['completed_at'] or order_data['updated_at']
+            orders_data.append(order_data)
         
-        return jsonify({'success': True, 'orders': orders_data})
+        return jsonify({'success': True, 'orders': orders_data, 'next_cursor': next_cursor})
     except Exception as e:
         current_app.logger.error(f"Error fetching order history: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @orders.route('/order/<int:order_id>/pay', methods=['POST'])
+@retry_on_locked
 def process_payment(order_id):
     order = Order.query.get_or_404(order_id)
     data = request.json
@@ -390,10 +558,17 @@ def process_payment(order_id):
     
     # Process payment (integrate with payment gateway here)
     # For demo, we'll just mark it as paid
+    old_status = order.status
     order.payment_status = 'paid'
     order.payment_method = payment_method
     order.status = 'paid'
+    update_rollups_for_status(order, old_status, order.status)
+    version = User.bump_order_version(order.user_id, order.id)
     db.session.commit()
+    try:
+        kitchen_queue.update_order(order, order.status, version)
+    except Exception as kitchen_error:
+        current_app.logger.error(f"Error updating the kitchen queue for order #{order.id}: {kitchen_error}")
     
     return jsonify({
         'message': 'Payment processed successfully',
@@ -401,37 +576,48 @@ def process_payment(order_id):
     })
 
 @orders.route('/order/<int:order_id>/feedback', methods=['POST'])
+@retry_on_locked
 def submit_feedback(order_id):
+    order = Order.query.get_or_404(order_id)
     data = request.json
     feedback = Feedback(
-        order_id=order_id,
+        order_id=order.id,
         rating=data.get('rating'),
         comment=data.get('comment', '')
     )
     db.session.add(feedback)
+    apply_feedback(order, feedback.rating)
     db.session.commit()
     
     return jsonify({'message': 'Feedback submitted successfully'})
 
 def estimate_preparation_time(order_id):
+    """Estimated minutes until an order is ready, from the restaurant's learned prep time model."""
     order = Order.query.get(order_id)
-    total_time = 0
-    
-    # Get current kitchen load
-    active_orders = Order.query.filter(
-        Order.status.in_(['pending', 'preparing'])
-    ).count()
-    
-    # Calculate base preparation time from menu items
-    for item in order.items:
-        menu_item = MenuItem.query.get(item.menu_item_id)
-        total_time += menu_item.preparation_time * item.quantity
+    if not order:
+        return None
+    return estimate_order_minutes(order)
+
+@orders.route('/api/orders/<int:order_id>/eta')
+def order_eta(order_id):
+    """Get the estimated ready time of an order."""
+    order = Order.query.get(order_id)
+    if not order:
+        return jsonify({'success': False, 'message': 'Order not found'}), 404
     
-    # Add overhead based on kitchen load
-    load_factor = 1 + (active_orders * 0.1)  # 10% increase per active order
-    estimated_time = total_time * load_factor
+    estimated_minutes = estimate_order_minutes(order)
+    ready_at = order.created_at + timedelta(minutes=estimated_minutes)
+    remaining_seconds = (ready_at - datetime.utcnow()).total_seconds()
     
-    return round(estimated_time)
+    return jsonify({
+        'success': True,
+        'order_id': order.id,
+        'status': order.status,
+        'estimated_minutes': estimated_minutes,
+        'ready_at': ready_at.isoformat(),
+        'remaining_minutes': max(0, math.ceil(remaining_seconds / 60)) if order.status in ['pending', 'preparing'] else 0,
+        'model': get_prep_model_stats(order.user_id)
+    })
 
 def generate_receipt(order_id):
     """Generate a URL for the order receipt."""
@@ -457,46 +643,34 @@ def get_table_order_history():
             table_id = int(table_id)
         except ValueError:
             return jsonify({'success': False, 'message': 'Table ID must be a number'}), 400
-            
-        # Query orders for this table
-        orders = Order.query.filter_by(
-            table_id=table_id
-        ).order_by(Order.created_at.desc()).all()
         
-        orders_data = []
-        for order in orders:
-            items = []
+        # Answer with 304 if the guest already has the current history for this table
+        etag = None
+        table = Table.query.get(table_id)
+        if table:
+            etag = make_etag('table-orders', table.id, table.user.order_version, table.user.menu_version, request.query_string)
+            cached_response = not_modified(etag)
+            if cached_response:
+                return cached_response
             
-            for item in order.items:
-                menu_item = MenuItem.query.get(item.menu_item_id)
-                item_name = "Unknown"
-                if menu_item:
-                    item_name = menu_item.name
-                
-                items.append({
-                    'id': item.id,
-                    'name': item_name,
-                    'quantity': item.quantity,
-                    'price': float(item.unit_price)
-                })
+        try:
+            after, limit = order_page_args()
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
             
-            orders_data.append({
-                'id': order.id,
-                'table_id': order.table_id,
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-                'updated_at': order.updated_at.isoformat() if order.updated_at else order.created_at.isoformat(),
-                'completed_at': order.completed_at.isoformat() if order.completed_at else None,
-                'total_amount': float(order.total_amount) if order.total_amount else 0,
-                'tax_amount': float(order.tax_amount) if order.tax_amount else 0,
-                'final_amount': float(order.final_amount) if order.final_amount else 0,
-                'items': items
-            })
+        # Query one page of orders for this table
+        orders, next_cursor = paginate_orders(
+            eager_order_query().filter(Order.table_id == table_id),
+            after, limit
+        )
+        orders_data = [project_order(order) for order in orders]
         
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'orders': orders_data
+            'orders': orders_data,
+            'next_cursor': next_cursor
         })
+        return with_etag(response, etag) if etag else response
     
     except Exception as e:
         import traceback
@@ -542,6 +716,7 @@ def order_receipt(order_id):
 
 @orders.route('/api/orders/<int:order_id>/cancel', methods=['POST'])
 @login_required
+@retry_on_locked
 def cancel_order(order_id):
     """Cancel an order."""
     try:
@@ -555,32 +730,32 @@ def cancel_order(order_id):
             }), 403
         
         # Update order status
+        old_status = order.status
         order.status = 'cancelled'
         order.updated_at = datetime.utcnow()
+        update_rollups_for_status(order, old_status, order.status)
         
         # Save changes
+        version = User.bump_order_version(order.user_id, order.id)
         db.session.commit()
         
         # Log the cancellation
         current_app.logger.info(f"Order #{order.id} cancelled by restaurant")
+        try:
+            kitchen_queue.update_order(order, order.status, version)
+        except Exception as kitchen_error:
+            current_app.logger.error(f"Error updating the kitchen queue for order #{order.id}: {kitchen_error}")
         
-        # Notify restaurant and customer about the cancellation
-        socketio.emit('order_update', {
-            'type': 'status_change',
-            'order': {
-                'id': order.id,
-                'status': order.status,
-                'table_id': order.table_id
-            },
-            'previous_status': 'active'
-        }, room=f"restaurant_{order.user_id}")
-        
-        # Send notification to table
-        socketio.emit('notification', {
+        # Notify restaurant and customer about the cancellation, batched with other updates
+        from routes.socket_notifications import notify_restaurant_order_status
+        notify_restaurant_order_status(order, order.status, old_status, version=version)
+        queue_order_notification(f"table_{order.table_id}", order.id, {
             'title': 'Order Cancelled',
             'message': f'Your order #{order.id} has been cancelled by the restaurant.',
-            'type': 'warning'
-        }, room=f"table_{order.table_id}")
+            'type': 'warning',
+            'order_id': order.id,
+            'status': order.status
+        })
         
         return jsonify({
             'success': True,
@@ -591,6 +766,8 @@ def cancel_order(order_id):
         
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            raise  # retried by retry_on_locked
         import traceback
         traceback_str = traceback.format_exc()
         current_app.logger.error(f"Error cancelling order: {str(e)}\n{traceback_str}")
@@ -604,40 +781,30 @@ def cancel_order(order_id):
 def all_restaurant_receipts():
     """Display all receipts for a restaurant."""
     try:
-        # Get all orders for this restaurant that are not cancelled
-        orders = Order.query.filter_by(user_id=current_user.id).filter(Order.status != 'cancelled').order_by(Order.created_at.desc()).all()
+        after, limit = order_page_args()
+    except ValueError:
+        after, limit = None, ORDER_PAGE_SIZE
+        
+    try:
+        # Get one page of this restaurant's orders that are not cancelled
+        orders, next_cursor = paginate_orders(
+            eager_order_query().filter(
+                Order.user_id == current_user.id,
+                Order.status != 'cancelled'
+            ),
+            after, limit
+        )
         
         # Prepare data for template
         orders_data = []
-        
         for order in orders:
-            # Get table
-            table = Table.query.get(order.table_id)
-            table_number = "Unknown"
-            if table:
-                table_number = table.number
-            
-            # Get total items
-            total_items = 0
-            for item in order.items:
-                total_items += item.quantity
-            
-            orders_data.append({
-                'id': order.id,
-                'table_number': table_number,
-                'status': order.status,
-                'created_at': order.created_at,
-                'payment_method': order.payment_method if hasattr(order, 'payment_method') else 'unknown',
-                'payment_status': order.payment_status if hasattr(order, 'payment_status') else 'unknown',
-                'total_amount': float(order.total_amount) if order.total_amount else 0,
-                'tax_amount': float(order.tax_amount) if order.tax_amount else 0,
-                'final_amount': float(order.final_amount) if order.final_amount else 0,
-                'total_items': total_items,
-                'receipt_url': url_for('orders.order_receipt', order_id=order.id)
-            })
+            order_data = project_order(order)
+            order_data['created_at'] = order.created_at
+            order_data['receipt_url'] = url_for('orders.order_receipt', order_id=order.id)
+            orders_data.append(order_data)
         
         # Render template
-        return render_template('orders/all_receipts.html', orders=orders_data)
+        return render_template('orders/all_receipts.html', orders=orders_data, next_cursor=next_cursor)
         
     except Exception as e:
         import traceback
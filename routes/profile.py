@@ -4,6 +4,7 @@ from werkzeug.utils import secure_filename
 import os
 import logging
 from models import User, db
+from routes.orders import set_restaurant_slug
 from werkzeug.security import check_password_hash, generate_password_hash
 
 # Create profile blueprint
@@ -54,7 +55,9 @@ def update_profile():
         # Update user data
         user = User.query.get(current_user.id)
         if user:
-            user.restaurant_name = restaurant_name
+            if user.restaurant_name != restaurant_name or not user.slug:
+                user.restaurant_name = restaurant_name
+                set_restaurant_slug(user)
             user.phone = phone
             user.address = address
             user.country = country
@@ -81,6 +84,9 @@ def update_profile():
                 if qr_url:
                     user.qr_code = qr_url
             
+            # Restaurant details are shown on the public menu
+            User.bump_menu_version(user.id)
+            
             # Save changes
             db.session.commit()
             flash('Profile updated successfully!', 'success')
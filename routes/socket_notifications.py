@@ -1,6 +1,12 @@
 from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required, current_user
 from flask_socketio import emit, join_room, leave_room
 from extensions import socketio
+from utils.socket_queue import get_presence
+from utils.notification_buffer import emit_to_room, events_since, current_seq, BUFFER_ID
+from utils.socket_batch import queue_order_update, queue_order_notification
+from utils.prometheus import SOCKETIO_CONNECTED_CLIENTS
+from models import Table
 import json
 from datetime import datetime
 import logging
@@ -15,9 +21,9 @@ handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s -
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
-# Store connected clients and notification cache
-connected_clients = {}  # table_id -> list of socket IDs
-notification_cache = {}  # room -> list of notifications
+# Table room membership lives in the presence store, shared between workers
+# when a message queue is configured (see utils/socket_queue.py). Room events
+# are buffered for replay to reconnecting clients (see utils/notification_buffer.py).
 
 # ===== Helper Functions =====
 def get_status_message(order_id, table_number, status):
@@ -31,23 +37,45 @@ def get_status_message(order_id, table_number, status):
     }
     return status_messages.get(status, f'Order #{order_id} status updated to {status}')
 
+def replay_missed_events(room, data):
+    """
+    Send a rejoining client the room events after its last_seq. Returns the
+    room's current seq and whether events were lost, so the client should reload.
+    """
+    last_seq = data.get('last_seq')
+    if last_seq is None:
+        return current_seq(room), False  # first join, nothing to catch up on
+    if data.get('buffer_id') not in (None, BUFFER_ID):
+        return current_seq(room), True  # last_seq was given out by another worker
+    try:
+        last_seq = int(last_seq)
+    except (TypeError, ValueError):
+        return current_seq(room), True
+    
+    events, missed = events_since(room, last_seq)
+    for event, payload in events:
+        emit(event, payload)
+    if events:
+        logger.info(f"Replayed {len(events)} events in {room} to {request.sid}")
+    return current_seq(room), missed
+
 # ===== Room Management =====
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection."""
     logger.info(f"Socket connected: {request.sid}")
+    SOCKETIO_CONNECTED_CLIENTS.inc()
     emit('connected', {'status': 'connected', 'sid': request.sid})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
     logger.info(f"Socket disconnected: {request.sid}")
+    SOCKETIO_CONNECTED_CLIENTS.dec()
     
-    # Remove client from connected_clients
-    for table_id, clients in connected_clients.items():
-        if request.sid in clients:
-            clients.remove(request.sid)
-            logger.info(f"Removed client {request.sid} from table {table_id}")
+    # Remove client from the rooms it joined
+    for room in get_presence().drop(request.sid):
+        logger.info(f"Removed client {request.sid} from {room}")
 
 @socketio.on('join_restaurant')
 def handle_join_restaurant(data):
@@ -60,16 +88,18 @@ def handle_join_restaurant(data):
             
         room = f"restaurant_{restaurant_id}"
         join_room(room)
+        get_presence().join(request.sid, room)
         logger.info(f"Client {request.sid} joined room: {room}")
         
-        # Send cached notifications if any
-        if room in notification_cache and notification_cache[room]:
-            for notification in notification_cache[room]:
-                emit('notification', notification)
+        # Send whatever the client missed while disconnected
+        seq, missed = replay_missed_events(room, data)
                 
         emit('room_joined', {
             'room': room,
-            'restaurant_id': restaurant_id
+            'restaurant_id': restaurant_id,
+            'seq': seq,
+            'buffer_id': BUFFER_ID,
+            'missed': missed
         })
     except Exception as e:
         logger.error(f"Error joining restaurant room: {str(e)}")
@@ -87,30 +117,28 @@ def handle_join_table(data):
         room = f"table_{table_id}"
         join_room(room)
         
-        # Add client to connected_clients
-        if table_id not in connected_clients:
-            connected_clients[table_id] = []
-        if request.sid not in connected_clients[table_id]:
-            connected_clients[table_id].append(request.sid)
+        # Record the client's presence at the table
+        get_presence().join(request.sid, room)
             
         logger.info(f"Client {request.sid} joined room: {room}")
         
-        # Send cached notifications if any
-        if room in notification_cache and notification_cache[room]:
-            for notification in notification_cache[room]:
-                emit('notification', notification)
+        # Send whatever the client missed while disconnected
+        seq, missed = replay_missed_events(room, data)
                 
         emit('room_joined', {
             'room': room,
-            'table_id': table_id
+            'table_id': table_id,
+            'seq': seq,
+            'buffer_id': BUFFER_ID,
+            'missed': missed
         })
     except Exception as e:
         logger.error(f"Error joining table room: {str(e)}")
         emit('error', {'message': str(e)})
 
 # ===== Notification Functions =====
-def notify_restaurant_new_order(order):
-    """Notify restaurant about a new order."""
+def notify_restaurant_new_order(order, version=None):
+    """Notify restaurant about a new order; version is the order board version it created."""
     try:
         # Basic validation
         if not order or not hasattr(order, 'id') or not hasattr(order, 'user_id'):
@@ -136,8 +164,9 @@ def notify_restaurant_new_order(order):
         }
         
         # Emit to restaurant room
-        socketio.emit('new_order', {
-            'order': order_data
+        emit_to_room('new_order', {
+            'order': order_data,
+            'version': version
         }, room=f"restaurant_{order.user_id}")
         
         # Log the notification
@@ -183,17 +212,17 @@ def notify_customer_order_status(order, new_status, old_status):
         elif new_status == 'cancelled':
             notification_type = 'danger'
         
-        # Emit to table room
-        socketio.emit('notification', {
+        # Queue for the table room, a newer status of the order in the same burst replaces it
+        queue_order_notification(f"table_{table_id}", order.id, {
             'title': f'Order #{order.id} Update',
             'message': message,
             'type': notification_type,
             'order_id': order.id,
             'status': new_status
-        }, room=f"table_{table_id}")
+        })
         
         # Log the notification
-        current_app.logger.info(f"Socket notification sent to table #{table_number}: Order #{order.id} status = {new_status}")
+        current_app.logger.info(f"Socket notification queued for table #{table_number}: Order #{order.id} status = {new_status}")
         return True
         
     except Exception as e:
@@ -202,8 +231,8 @@ def notify_customer_order_status(order, new_status, old_status):
         current_app.logger.error(traceback.format_exc())
         return False
 
-def notify_restaurant_order_status(order, new_status, old_status):
-    """Notify restaurant about an order status change."""
+def notify_restaurant_order_status(order, new_status, old_status, version=None):
+    """Notify restaurant about an order status change; version is the order board version it created."""
     try:
         # Basic validation
         if not order or not hasattr(order, 'id') or not hasattr(order, 'user_id'):
@@ -224,17 +253,15 @@ def notify_restaurant_order_status(order, new_status, old_status):
             'table_number': table_number,
             'status': new_status,
             'previous_status': old_status,
-            'updated_at': datetime.utcnow().isoformat()
+            'updated_at': datetime.utcnow().isoformat(),
+            'version': version
         }
         
-        # Emit to restaurant room
-        socketio.emit('order_update', {
-            'type': 'status_change',
-            'order': update_data
-        }, room=f"restaurant_{order.user_id}")
+        # Queue for the restaurant room's next batched order_updates frame
+        queue_order_update(f"restaurant_{order.user_id}", update_data)
         
         # Log the notification
-        current_app.logger.info(f"Socket notification sent: Order #{order.id} status change to {new_status}")
+        current_app.logger.info(f"Socket notification queued: Order #{order.id} status change to {new_status}")
         return True
         
     except Exception as e:
@@ -244,6 +271,26 @@ def notify_restaurant_order_status(order, new_status, old_status):
         return False
 
 # ===== API Routes =====
+@notification_bp.route('/presence', methods=['GET'])
+@login_required
+def restaurant_presence():
+    """Which of the restaurant's tables have guests connected, and how many staff screens are open."""
+    tables = Table.query.filter_by(user_id=current_user.id).order_by(Table.number).all()
+    restaurant_room = f"restaurant_{current_user.id}"
+    counts = get_presence().counts([restaurant_room] + [f"table_{table.id}" for table in tables])
+    
+    table_presence = [{
+        'table_id': table.id,
+        'number': table.number,
+        'guests': counts[f"table_{table.id}"]
+    } for table in tables]
+    return jsonify({
+        'success': True,
+        'screens': counts[restaurant_room],
+        'occupied_tables': sum(1 for table in table_presence if table['guests']),
+        'tables': table_presence
+    })
+
 @notification_bp.route('/debug', methods=['GET'])
 def debug_view():
     """Debug view to test notifications."""
@@ -267,7 +314,7 @@ def test_notification():
             'timestamp': datetime.utcnow().isoformat()
         }
         
-        socketio.emit('notification', notification, room=room)
+        emit_to_room('notification', notification, room=room)
         
         # Play sound if specified
         sound = data.get('sound')
@@ -4,11 +4,10 @@ import qrcode
 from io import BytesIO
 import os
 from models import Table, db, User, Order
-from PIL import Image
 from datetime import datetime
 import socket
 from urllib.parse import quote
-from routes.orders import slugify
+from routes.orders import restaurant_slug_for
 
 table_bp = Blueprint('table', __name__, url_prefix='/table')
 
@@ -65,8 +64,8 @@ def generate_qr_code(table, restaurant_name):
     if not os.path.exists(qr_dir):
         os.makedirs(qr_dir)
     
-    # Create slugified restaurant name
-    restaurant_slug = slugify(restaurant_name)
+    # Get the restaurant's URL slug
+    restaurant_slug = restaurant_slug_for(table.user)
     
     # Generate a timestamp for uniqueness
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -187,6 +186,8 @@ def update_table(id):
             table.number = data['number']
             qr_code_path = generate_qr_code(table, current_user.restaurant_name or current_user.name)
             table.qr_code = qr_code_path
+            # Order payloads show the table number, so cached order lists are stale now
+            User.bump_order_version(current_user.id)
         
         # Update capacity if provided
         if 'capacity' in data:
@@ -246,6 +247,8 @@ def delete_table(id):
         # Instead of deleting table, mark it as archived/deleted
         table.status = 'deleted'
         table.qr_code = None  # Remove QR code reference
+        # Invalidate cached order lists that show this table
+        User.bump_order_version(current_user.id)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Table deleted successfully'}), 200
@@ -302,7 +305,7 @@ def get_qr(id):
         db.session.commit()
         
         # Get the full URL for the menu
-        menu_url = url_for('menu.view_menu', restaurant_slug=slugify(restaurant_name), table_id=table.id, _external=True)
+        menu_url = url_for('menu.view_menu', restaurant_slug=restaurant_slug_for(restaurant), table_id=table.id, _external=True)
         
         current_app.logger.info(f"QR code regenerated for table {table.number}: {qr_code_path}")
         
@@ -0,0 +1,154 @@
+import os
+import time
+import hashlib
+import sqlite3
+import logging
+from threading import Lock, BoundedSemaphore, local
+
+from utils.prometheus import time_ai_call
+
+logger = logging.getLogger(__name__)
+
+# Persistent prompt/response cache for model calls, keyed by model, prompt and image bytes
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'ai_cache.sqlite'
+)
+AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', 30 * 24 * 60 * 60))  # seconds
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 10000))
+# Most model calls in flight at once in this process, whatever code path makes them
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 4))
+
+ai_cache_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+_stats_lock = Lock()
+_connections = local()
+_provider_slots = BoundedSemaphore(AI_MAX_CONCURRENCY)
+
+def _connect():
+    """Get this thread's connection to the cache database, creating the table on first use."""
+    conn = getattr(_connections, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(AI_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(AI_CACHE_PATH, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS ai_response (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_ai_response_last_access ON ai_response (last_access)')
+        conn.commit()
+        _connections.conn = conn
+    return conn
+
+def _count(stat, amount=1):
+    with _stats_lock:
+        ai_cache_stats[stat] += amount
+
+def cache_key(model_name, prompt, image_bytes=None):
+    """Hash the model name, prompt and optional image bytes into a cache key."""
+    digest = hashlib.sha256()
+    for part in (model_name.encode('utf-8'), prompt.encode('utf-8'), image_bytes or b''):
+        # Length-prefix each part so different splits can't collide
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+def get_cached_response(key):
+    """Get a cached response text, or None if it is missing or expired."""
+    conn = _connect()
+    row = conn.execute('SELECT response, created_at FROM ai_response WHERE key = ?', (key,)).fetchone()
+    now = time.time()
+    if row is None or now - row[1] > AI_CACHE_TTL:
+        _count('misses')
+        return None
+
+    conn.execute('UPDATE ai_response SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+    conn.commit()
+    _count('hits')
+    return row[0]
+
+def store_response(key, model_name, response_text):
+    """Store a response and evict the least recently used entries over the size limit."""
+    conn = _connect()
+    now = time.time()
+    conn.execute(
+        'INSERT OR REPLACE INTO ai_response (key, model, response, created_at, last_access, hits) VALUES (?, ?, ?, ?, ?, 0)',
+        (key, model_name, response_text, now, now)
+    )
+    evicted = conn.execute(
+        'DELETE FROM ai_response WHERE key IN ('
+        '  SELECT key FROM ai_response ORDER BY last_access DESC LIMIT -1 OFFSET ?'
+        ')',
+        (AI_CACHE_MAX_ENTRIES,)
+    ).rowcount
+    conn.commit()
+    _count('stores')
+    if evicted > 0:
+        _count('evictions', evicted)
+
+def _generate(model, model_name, contents, timeout=None, **kwargs):
+    """
+    Call the model itself, waiting for one of the AI_MAX_CONCURRENCY slots.
+    With a timeout, waiting for the slot and the provider request are each
+    limited to it and TimeoutError is raised if no slot frees up, so a stuck
+    call gives its slot back after at most timeout seconds.
+    Timed per model and text/vision for /metrics.
+    """
+    if timeout is not None:
+        kwargs.setdefault('request_options', {}).setdefault('timeout', timeout)
+    if not _provider_slots.acquire(timeout=timeout if timeout is not None else -1):
+        raise TimeoutError(f"No AI call slot free within {timeout}s")
+    operation = 'vision' if isinstance(contents, list) else 'text'
+    try:
+        with time_ai_call(model_name.rsplit('/', 1)[-1], operation):
+            return model.generate_content(contents, **kwargs).text
+    finally:
+        _provider_slots.release()
+
+def cached_generate(model, prompt, image=None, image_bytes=None, validate=None, timeout=None, **kwargs):
+    """
+    Call model.generate_content through the cache and return the response text.
+    Pass the raw image_bytes along with an image so the image is part of the key.
+    Responses that fail validate(text) are returned but not cached. timeout bounds
+    the wait for a call slot and the provider request, see _generate.
+    """
+    model_name = getattr(model, 'model_name', type(model).__name__)
+    contents = [prompt, image] if image is not None else prompt
+
+    if not AI_CACHE_ENABLED:
+        return _generate(model, model_name, contents, timeout, **kwargs)
+
+    key = cache_key(model_name, prompt, image_bytes)
+    try:
+        cached = get_cached_response(key)
+    except sqlite3.Error as e:
+        logger.warning(f"AI cache lookup failed: {e}")
+        cached = None
+    if cached is not None:
+        return cached
+
+    text = _generate(model, model_name, contents, timeout, **kwargs)
+    if validate is None or validate(text):
+        try:
+            store_response(key, model_name, text)
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache store failed: {e}")
+    return text
+
+def get_ai_cache_stats():
+    """Get hit/miss counters for this process and the size of the cache."""
+    with _stats_lock:
+        stats = dict(ai_cache_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    try:
+        stats['entries'] = _connect().execute('SELECT COUNT(*) FROM ai_response').fetchone()[0]
+    except sqlite3.Error:
+        stats['entries'] = None
+    return stats
@@ -0,0 +1,48 @@
+import json
+
+# Canned menu returned for any image, so uploads can be exercised without Gemini
+STUB_MENU_ITEMS = [
+    {
+        'name': 'Margherita Pizza',
+        'description': 'Tomato, mozzarella and fresh basil',
+        'price': 9.5,
+        'category': 'Pizza',
+        'preparation_time': 15
+    },
+    {
+        'name': 'Regular Burger',
+        'description': 'Beef patty, cheddar, lettuce and tomato',
+        'price': 7.0,
+        'category': 'Burgers',
+        'preparation_time': 12
+    },
+    {
+        'name': 'Small Fries',
+        'description': 'Crispy salted fries',
+        'price': 2.5,
+        'category': 'Sides',
+        'preparation_time': 5
+    }
+]
+
+class StubResponse:
+    """Mimics the part of a Gemini response the helpers use."""
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Local stand-in for genai.GenerativeModel, selected with AI_BACKEND=stub."""
+    def __init__(self, model_name='stub'):
+        self.model_name = model_name
+
+    def generate_content(self, contents, **kwargs):
+        # Vision calls pass [prompt, image]; answer them with the canned menu
+        if isinstance(contents, (list, tuple)):
+            return StubResponse(json.dumps(STUB_MENU_ITEMS))
+
+        prompt = contents.lower()
+        if 'preparation time' in prompt:
+            return StubResponse('15')
+        if 'menu text' in prompt:
+            return StubResponse(json.dumps(STUB_MENU_ITEMS))
+        return StubResponse('Freshly prepared house favourite')
@@ -0,0 +1,158 @@
+import os
+import time
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Pool counters for this process
+pool_stats = {
+    'connects': 0,
+    'checkouts': 0,
+    'checkins': 0,
+    'invalidations': 0,
+    'timeouts': 0,
+    'wait_time_total': 0.0,
+    'wait_time_max': 0.0,
+    'hold_time_total': 0.0,
+    'hold_time_max': 0.0,
+    'overflow_max': 0
+}
+_open_connections = {}  # id(connection record) -> time the connection was opened
+_lock = Lock()
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+def engine_options_from_env(database_uri):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the database, from DB_POOL_* environment variables.
+    Server databases get sized defaults; SQLite only gets the settings that are set
+    explicitly, and in-memory SQLite keeps Flask-SQLAlchemy's single shared connection.
+    """
+    url = make_url(database_uri)
+    is_sqlite = url.get_backend_name() == 'sqlite'
+    if is_sqlite and url.database in (None, '', ':memory:'):
+        return {}
+
+    defaults = {
+        'DB_POOL_SIZE': '10',
+        'DB_MAX_OVERFLOW': '20',
+        'DB_POOL_TIMEOUT': '30',  # seconds to wait for a connection
+        'DB_POOL_RECYCLE': '1800',  # seconds before a connection is replaced
+        'DB_POOL_PRE_PING': 'true',
+        'DB_POOL_USE_LIFO': 'false'  # LIFO lets idle connections time out server-side
+    }
+    settings = {
+        name: os.getenv(name, None if is_sqlite else default)
+        for name, default in defaults.items()
+    }
+
+    options = {'poolclass': TimedQueuePool}
+    if settings['DB_POOL_SIZE'] is not None:
+        options['pool_size'] = int(settings['DB_POOL_SIZE'])
+    if settings['DB_MAX_OVERFLOW'] is not None:
+        options['max_overflow'] = int(settings['DB_MAX_OVERFLOW'])
+    if settings['DB_POOL_TIMEOUT'] is not None:
+        options['pool_timeout'] = float(settings['DB_POOL_TIMEOUT'])
+    if settings['DB_POOL_RECYCLE'] is not None:
+        options['pool_recycle'] = int(settings['DB_POOL_RECYCLE'])
+    if settings['DB_POOL_PRE_PING'] is not None:
+        options['pool_pre_ping'] = _env_flag('DB_POOL_PRE_PING', settings['DB_POOL_PRE_PING'])
+    if settings['DB_POOL_USE_LIFO'] is not None:
+        options['pool_use_lifo'] = _env_flag('DB_POOL_USE_LIFO', settings['DB_POOL_USE_LIFO'])
+    return options
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with _lock:
+                pool_stats['timeouts'] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _lock:
+                pool_stats['wait_time_total'] += waited
+                pool_stats['wait_time_max'] = max(pool_stats['wait_time_max'], waited)
+
+def instrument_pool(engine):
+    """Count connects, checkouts, checkins and hold times on the engine's pool."""
+    # Pool events carry over when engine.dispose() replaces the pool
+    pool = engine.pool
+
+    @event.listens_for(pool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        with _lock:
+            pool_stats['connects'] += 1
+            _open_connections[id(connection_record)] = time.time()
+
+    @event.listens_for(pool, 'close')
+    def on_close(dbapi_connection, connection_record):
+        with _lock:
+            _open_connections.pop(id(connection_record), None)
+
+    @event.listens_for(pool, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with _lock:
+            pool_stats['invalidations'] += 1
+            _open_connections.pop(id(connection_record), None)
+
+    @event.listens_for(pool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        current_pool = engine.pool
+        overflow = current_pool.overflow() if isinstance(current_pool, QueuePool) else 0
+        with _lock:
+            pool_stats['checkouts'] += 1
+            pool_stats['overflow_max'] = max(pool_stats['overflow_max'], overflow)
+
+    @event.listens_for(pool, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        with _lock:
+            pool_stats['checkins'] += 1
+            if checked_out_at is not None:
+                held = time.perf_counter() - checked_out_at
+                pool_stats['hold_time_total'] += held
+                pool_stats['hold_time_max'] = max(pool_stats['hold_time_max'], held)
+
+def get_pool_stats(engine):
+    """Get the pool's current state and counters for this process."""
+    pool = engine.pool
+    now = time.time()
+    with _lock:
+        stats = dict(pool_stats)
+        ages = [now - opened_at for opened_at in _open_connections.values()]
+
+    checkouts = stats['checkouts']
+    result = {
+        'pool_class': type(pool).__name__,
+        'connects': stats['connects'],
+        'checkouts': checkouts,
+        'checkins': stats['checkins'],
+        'invalidations': stats['invalidations'],
+        'timeouts': stats['timeouts'],
+        'overflow_max': stats['overflow_max'],
+        'wait_ms_avg': round(stats['wait_time_total'] / checkouts * 1000, 3) if checkouts else 0.0,
+        'wait_ms_max': round(stats['wait_time_max'] * 1000, 3),
+        'hold_ms_avg': round(stats['hold_time_total'] / stats['checkins'] * 1000, 3) if stats['checkins'] else 0.0,
+        'hold_ms_max': round(stats['hold_time_max'] * 1000, 3),
+        'open_connections': len(ages),
+        'connection_age_s_avg': round(sum(ages) / len(ages), 1) if ages else 0.0,
+        'connection_age_s_max': round(max(ages), 1) if ages else 0.0
+    }
+    if isinstance(pool, QueuePool):
+        result.update({
+            'size': pool.size(),
+            'timeout': pool.timeout(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+    return result
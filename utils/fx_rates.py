@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import logging
+from threading import Lock, Thread
+
+logger = logging.getLogger(__name__)
+
+# How long a rate is fresh, in seconds. Stale rates are still served while
+# a background refresh fetches a new one.
+FX_RATE_TTL = float(os.getenv('FX_RATE_TTL', 6 * 60 * 60))
+
+# Optional local rates file: {"base": "USD", "timestamp": 1760000000, "rates": {"INR": 83.2, ...}}
+FX_RATES_FILE = os.getenv('FX_RATES_FILE')
+
+# Never fetch rates over the network, only use the rates file
+FX_OFFLINE = os.getenv('FX_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+_rates = {}  # (from_currency, to_currency) -> (rate, fetched_at)
+_file_rates = {'base': None, 'rates': {}, 'timestamp': 0}
+_refreshing = set()
+_lock = Lock()
+
+def load_rates_file(path):
+    """Load base-currency rates from a local JSON file; replaces cached rates."""
+    with open(path) as f:
+        data = json.load(f)
+
+    base = data['base'].upper()
+    rates = {currency.upper(): float(rate) for currency, rate in data['rates'].items()}
+    rates[base] = 1.0
+    with _lock:
+        _file_rates.update(base=base, rates=rates, timestamp=float(data.get('timestamp') or os.path.getmtime(path)))
+        _rates.clear()
+    logger.info(f"Loaded {len(rates)} exchange rates from {path}")
+
+def _rate_from_file(from_currency, to_currency):
+    """Get a cross rate from the loaded rates file, or None."""
+    rates = _file_rates['rates']
+    if from_currency in rates and to_currency in rates:
+        return rates[to_currency] / rates[from_currency]
+    return None
+
+def _fetch_rate(from_currency, to_currency):
+    """Fetch a live rate from the exchange rate service."""
+    from forex_python.converter import CurrencyRates
+    return float(CurrencyRates().get_rate(from_currency, to_currency))
+
+def _refresh(key):
+    """Fetch a new rate for a currency pair and store it."""
+    try:
+        rate = _fetch_rate(*key)
+        with _lock:
+            _rates[key] = (rate, time.time())
+    except Exception as e:
+        logger.warning(f"Could not refresh exchange rate {key[0]}->{key[1]}: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+def _refresh_in_background(key):
+    """Start a background refresh for a currency pair unless one is running."""
+    if FX_OFFLINE:
+        return
+    with _lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    Thread(target=_refresh, args=(key,), daemon=True, name=f'fx-{key[0]}-{key[1]}').start()
+
+def get_rate(from_currency, to_currency):
+    """Get the exchange rate between two currencies, or None if it is unknown."""
+    key = (from_currency.upper(), to_currency.upper())
+    if key[0] == key[1]:
+        return 1.0
+
+    with _lock:
+        cached = _rates.get(key)
+        if cached is None:
+            rate = _rate_from_file(*key)
+            if rate is not None:
+                cached = (rate, _file_rates['timestamp'])
+                _rates[key] = cached
+
+    if cached is not None:
+        rate, fetched_at = cached
+        if time.time() - fetched_at > FX_RATE_TTL:
+            _refresh_in_background(key)
+        return rate
+
+    # Nothing cached or on file - the first lookup for this pair has to wait
+    if FX_OFFLINE:
+        return None
+    try:
+        rate = _fetch_rate(*key)
+    except Exception as e:
+        logger.warning(f"Could not fetch exchange rate {key[0]}->{key[1]}: {e}")
+        return None
+    with _lock:
+        _rates[key] = (rate, time.time())
+    return rate
+
+def convert_prices(prices, from_currency, to_currency):
+    """
+    Convert a list of prices with a single rate lookup.
+    Returns (converted prices, currency); prices are left as they are in
+    from_currency when no rate is available.
+    """
+    rate = get_rate(from_currency, to_currency)
+    if rate is None:
+        return [float(price) for price in prices], from_currency.upper()
+    return [round(float(price) * rate, 2) for price in prices], to_currency.upper()
+
+if FX_RATES_FILE:
+    try:
+        load_rates_file(FX_RATES_FILE)
+    except Exception as e:
+        logger.error(f"Could not load exchange rates file {FX_RATES_FILE}: {e}")
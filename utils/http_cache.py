@@ -0,0 +1,19 @@
+import hashlib
+from flask import request, make_response, current_app
+
+def make_etag(*parts):
+    """Build a strong ETag value from the versions a response depends on."""
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def with_etag(response, etag):
+    """Attach the ETag to a response and make clients revalidate before reusing it."""
+    response = make_response(response)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag):
+    """Get a 304 response if the client's cached copy matches the ETag, otherwise None."""
+    if request.if_none_match.contains(etag):
+        return with_etag(current_app.response_class(status=304), etag)
+    return None
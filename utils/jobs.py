@@ -0,0 +1,69 @@
+import json
+import logging
+import os
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+
+from flask import current_app
+from models import Job, db
+
+logger = logging.getLogger(__name__)
+
+# Local worker pool shared by all background jobs in this process
+_executor = None
+_executor_lock = Lock()
+
+def get_executor():
+    """Get the worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = current_app.config.get('JOB_WORKERS') or int(os.environ.get('JOB_WORKERS', 2))
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        return _executor
+
+def submit_job(kind, user_id, func, *args):
+    """Persist a queued job and run func(job_id, *args) on the worker pool.
+
+    Returns the job id right away. The return value of func is stored as the
+    job result, an exception marks the job as failed.
+    """
+    job = Job(id=uuid.uuid4().hex, user_id=user_id, kind=kind, status='queued', progress=0)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    get_executor().submit(_run_job, app, job.id, func, args)
+    return job.id
+
+def update_job(job_id, **fields):
+    """Update a job's status, progress or message and commit right away."""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return None
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+    return job
+
+def _run_job(app, job_id, func, args):
+    """Run a job inside an app context and record its outcome."""
+    with app.app_context():
+        update_job(job_id, status='running')
+        try:
+            result = func(job_id, *args)
+            update_job(
+                job_id,
+                status='completed',
+                progress=100,
+                message=result.get('message', 'Completed') if isinstance(result, dict) else 'Completed',
+                result=json.dumps(result) if result is not None else None,
+                finished_at=datetime.utcnow()
+            )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Job {job_id} failed: {e}\n{traceback.format_exc()}")
+            update_job(job_id, status='failed', message=str(e), finished_at=datetime.utcnow())
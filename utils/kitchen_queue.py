@@ -0,0 +1,251 @@
+import heapq
+from datetime import datetime, timedelta
+from threading import Lock
+
+from sqlalchemy.orm import joinedload, selectinload
+from extensions import socketio
+from models import db, User, Order, OrderItem, MenuItem
+
+# In-memory kitchen queue per restaurant: one ticket per line of an active order.
+# An order is promised ready when its slowest item would be, so every ticket has
+# a fire-by time (promised ready minus its own prep time) and the kitchen works
+# tickets in fire-by order, per station (menu category) or across all of them.
+# The database is the source of truth: a ticket is fired when its order is
+# preparing or its line has fired_at set, and every change bumps the restaurant's
+# order_version. Each worker keeps the queue of the version it last applied and
+# reloads it once the version has moved on, e.g. after a change made by another
+# worker. Changes go out as 'kitchen_queue' deltas to the restaurant room.
+
+KITCHEN_STATUSES = ('pending', 'preparing')  # orders with work left for the kitchen
+DEFAULT_STATION = 'Kitchen'
+FIRE_ATTEMPTS = 3  # fire_next tries again when another worker fired the ticket first
+
+kitchen_queues = {}  # restaurant_id -> queue dict, see _new_queue
+_lock = Lock()  # guards the in-memory queues only, never held over database or socket calls
+
+def _new_queue(version):
+    return {
+        'tickets': {},  # order_item_id -> ticket
+        'orders': {},  # order_id -> set of order_item_ids
+        'heaps': {},  # station -> heap of (fire_by, order created_at, order_item_id) for queued tickets
+        'version': version  # the restaurant's order_version this queue reflects
+    }
+
+def make_tickets(order, lines, table_number):
+    """
+    Build the tickets of an order from (order_item, menu_item) pairs. The order is
+    promised ready when its slowest item is, so faster items are fired later.
+    """
+    prep_minutes = [(menu_item.preparation_time if menu_item and menu_item.preparation_time else 15)
+                    for _, menu_item in lines]
+    promised_ready_at = order.created_at + timedelta(minutes=max(prep_minutes, default=0))
+    preparing = order.status == 'preparing'
+
+    tickets = []
+    for (order_item, menu_item), minutes in zip(lines, prep_minutes):
+        fired_at = order_item.fired_at or (order.updated_at if preparing else None)
+        tickets.append({
+            'id': order_item.id,
+            'order_id': order.id,
+            'table_id': order.table_id,
+            'table_number': table_number,
+            'menu_item_id': order_item.menu_item_id,
+            'name': menu_item.name if menu_item else 'Unknown',
+            'station': (menu_item.category if menu_item else None) or DEFAULT_STATION,
+            'quantity': order_item.quantity,
+            'special_instructions': order_item.special_instructions,
+            'prep_minutes': minutes,
+            'order_created_at': order.created_at,
+            'promised_ready_at': promised_ready_at,
+            'fire_by': promised_ready_at - timedelta(minutes=minutes),
+            'state': 'fired' if preparing or order_item.fired_at else 'queued',
+            'fired_at': fired_at
+        })
+    return tickets
+
+def serialize_ticket(ticket):
+    data = dict(ticket)
+    for name in ('order_created_at', 'promised_ready_at', 'fire_by', 'fired_at'):
+        data[name] = data[name].isoformat() if data[name] else None
+    return data
+
+def _push(queue, ticket):
+    """Add a ticket to the queue; queued tickets also go on their station's heap."""
+    queue['tickets'][ticket['id']] = ticket
+    queue['orders'].setdefault(ticket['order_id'], set()).add(ticket['id'])
+    if ticket['state'] == 'queued':
+        heapq.heappush(queue['heaps'].setdefault(ticket['station'], []),
+                       (ticket['fire_by'], ticket['order_created_at'], ticket['id']))
+
+def _replace_order(queue, order_id, tickets):
+    """Swap an order's tickets for new ones; heap entries of the old ones are skipped when popped."""
+    for ticket_id in queue['orders'].pop(order_id, set()):
+        queue['tickets'].pop(ticket_id, None)
+    for ticket in tickets:
+        _push(queue, ticket)
+
+def _current_version(restaurant_id):
+    return db.session.execute(db.select(User.order_version).where(User.id == restaurant_id)).scalar() or 0
+
+def load_kitchen_queue(restaurant_id):
+    """Build a restaurant's queue from its pending and preparing orders."""
+    version = _current_version(restaurant_id)
+    orders = Order.query.options(
+        joinedload(Order.assigned_table),
+        selectinload(Order.items).joinedload(OrderItem.menu_item)
+    ).filter(Order.user_id == restaurant_id, Order.status.in_(KITCHEN_STATUSES)).all()
+
+    queue = _new_queue(version)
+    for order in orders:
+        table_number = order.assigned_table.number if order.assigned_table else 'Unknown'
+        for ticket in make_tickets(order, [(item, item.menu_item) for item in order.items], table_number):
+            _push(queue, ticket)
+    return queue
+
+def _get_queue(restaurant_id):
+    """Get a restaurant's queue, (re)loading it when the orders changed since it was built."""
+    version = _current_version(restaurant_id)
+    with _lock:
+        queue = kitchen_queues.get(restaurant_id)
+    if queue is not None and queue['version'] >= version:
+        return queue
+
+    loaded = load_kitchen_queue(restaurant_id)
+    with _lock:
+        queue = kitchen_queues.get(restaurant_id)
+        # Another thread may have loaded a newer one meanwhile
+        if queue is None or queue['version'] < loaded['version']:
+            queue = kitchen_queues[restaurant_id] = loaded
+    return queue
+
+def _apply(restaurant_id, version, apply):
+    """
+    Run apply(queue) on this worker's queue when version is the next one it expects.
+    A queue that's further behind reloads on its next use instead.
+    """
+    with _lock:
+        queue = kitchen_queues.get(restaurant_id)
+        if queue is not None and queue['version'] == version - 1:
+            apply(queue)
+            queue['version'] = version
+
+def _emit_delta(restaurant_id, version, change, order_id, tickets):
+    """Send a queue change to the restaurant's kitchen screens, whichever worker they're on."""
+    socketio.emit('kitchen_queue', {
+        'type': change,
+        'version': version,
+        'order_id': order_id,
+        'tickets': [serialize_ticket(ticket) for ticket in tickets]
+    }, room=f"restaurant_{restaurant_id}")
+
+def _order_tickets(order, table_number=None):
+    """Build an order's tickets, reading its lines from the database."""
+    lines = db.session.query(OrderItem, MenuItem).outerjoin(
+        MenuItem, OrderItem.menu_item_id == MenuItem.id
+    ).filter(OrderItem.order_id == order.id).order_by(OrderItem.id).all()
+    if table_number is None:
+        table_number = order.assigned_table.number if order.assigned_table else 'Unknown'
+    return make_tickets(order, lines, table_number)
+
+def add_order(order, version, table_number=None):
+    """Queue the tickets of a new order, committed as order version version."""
+    tickets = _order_tickets(order, table_number)
+    _apply(order.user_id, version, lambda queue: _replace_order(queue, order.id, tickets))
+    _emit_delta(order.user_id, version, 'added', order.id, tickets)
+
+def update_order(order, new_status, version):
+    """
+    Follow an order's status change, committed as order version version:
+    'preparing' fires its tickets, leaving the kitchen statuses removes them and
+    coming back queues them again. Deltas carry all of the order's tickets.
+    """
+    if new_status in KITCHEN_STATUSES:
+        tickets = _order_tickets(order)
+        change = 'fired' if new_status == 'preparing' else 'added'
+    else:
+        tickets = []
+        change = 'removed'
+    _apply(order.user_id, version, lambda queue: _replace_order(queue, order.id, tickets))
+    _emit_delta(order.user_id, version, change, order.id, tickets)
+
+def _pop_next(queue, station=None):
+    """Take the queued ticket with the earliest fire-by time, or None."""
+    stations = [station] if station else list(queue['heaps'])
+    best = None
+    for name in stations:
+        heap = queue['heaps'].get(name, [])
+        # Drop entries of tickets that were fired or removed since they were pushed
+        while heap and (heap[0][2] not in queue['tickets'] or queue['tickets'][heap[0][2]]['state'] != 'queued'):
+            heapq.heappop(heap)
+        if heap and (best is None or heap[0] < best[1]):
+            best = (name, heap[0])
+    if best is None:
+        return None
+    heapq.heappop(queue['heaps'][best[0]])
+    return queue['tickets'][best[1][2]]
+
+def _claim(restaurant_id, ticket, fired_at):
+    """
+    Mark a ticket fired in the database and return the new order version, or None
+    when it was fired or left the kitchen meanwhile.
+    """
+    claimed = db.session.execute(db.update(OrderItem).where(
+        OrderItem.id == ticket['id'],
+        OrderItem.fired_at.is_(None),
+        OrderItem.order_id.in_(db.select(Order.id).where(
+            Order.user_id == restaurant_id, Order.status.in_(KITCHEN_STATUSES)
+        ))
+    ).values(fired_at=fired_at)).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+    version = User.bump_order_version(restaurant_id, ticket['order_id'])
+    db.session.commit()
+    return version
+
+def fire_next(restaurant_id, station=None):
+    """Mark the most urgent queued ticket as fired and return it, or None when nothing is queued."""
+    for _ in range(FIRE_ATTEMPTS):
+        queue = _get_queue(restaurant_id)
+        with _lock:
+            ticket = _pop_next(queue, station)
+            ticket = dict(ticket) if ticket else None
+        if ticket is None:
+            return None
+
+        fired_at = datetime.utcnow()
+        version = _claim(restaurant_id, ticket, fired_at)
+        if version is None:
+            continue  # fired by another worker; its version bump makes _get_queue reload
+        ticket.update(state='fired', fired_at=fired_at)
+
+        def mark_fired(queue):
+            if ticket['id'] in queue['tickets']:
+                queue['tickets'][ticket['id']].update(state='fired', fired_at=fired_at)
+        _apply(restaurant_id, version, mark_fired)
+        _emit_delta(restaurant_id, version, 'fired', ticket['order_id'], [ticket])
+        return ticket
+    return None
+
+def get_kitchen_snapshot(restaurant_id):
+    """All tickets in fire-by order with per-station load, for a screen (re)connecting."""
+    queue = _get_queue(restaurant_id)
+    with _lock:
+        tickets = sorted(queue['tickets'].values(),
+                         key=lambda ticket: (ticket['fire_by'], ticket['order_created_at'], ticket['id']))
+        stations = {}
+        for ticket in tickets:
+            load = stations.setdefault(ticket['station'], {'queued': 0, 'fired': 0, 'queued_minutes': 0})
+            load[ticket['state']] += 1
+            if ticket['state'] == 'queued':
+                load['queued_minutes'] += ticket['prep_minutes']
+        return {
+            'version': queue['version'],
+            'tickets': [serialize_ticket(ticket) for ticket in tickets],
+            'stations': stations
+        }
+
+def reset_kitchen_queue(restaurant_id):
+    """Forget a restaurant's queue so the next access reloads it from the database."""
+    with _lock:
+        kitchen_queues.pop(restaurant_id, None)
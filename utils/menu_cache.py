@@ -0,0 +1,76 @@
+from threading import Lock
+from models import MenuItem
+
+# Categorized, sorted menu per restaurant: restaurant_id -> (menu_version, list of categories)
+menu_snapshots = {}
+menu_snapshot_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_generations = {}  # restaurant_id -> number of invalidations, guards against storing stale builds
+_lock = Lock()
+
+def build_menu_snapshot(restaurant_id):
+    """Build the categorized, sorted list of available menu items for a restaurant."""
+    menu_items = MenuItem.query.filter_by(
+        user_id=restaurant_id,
+        is_available=True
+    ).all()
+
+    # Group menu items by category
+    categories = {}
+    for item in menu_items:
+        category = item.category or 'Uncategorized'
+        if category not in categories:
+            categories[category] = {
+                'id': len(categories) + 1,
+                'name': category,
+                'menu_items': []
+            }
+        # Convert MenuItem object to dictionary for JSON serialization
+        item_dict = item.to_dict()
+        # Add reference to the original id for the template
+        item_dict['original_id'] = item.id
+        categories[category]['menu_items'].append(item_dict)
+
+    # Sort categories and menu items
+    sorted_categories = sorted(categories.values(), key=lambda x: x['name'])
+    for category in sorted_categories:
+        category['menu_items'].sort(key=lambda x: x['name'])
+
+    return sorted_categories
+
+def get_menu_snapshot(restaurant_id, version=None):
+    """Get the menu snapshot for a restaurant, building it on first use.
+
+    Passing the restaurant's menu_version also catches changes made by other
+    worker processes. The snapshot is shared between requests and must not be modified.
+    """
+    with _lock:
+        cached = menu_snapshots.get(restaurant_id)
+        if cached is not None and (version is None or cached[0] == version):
+            menu_snapshot_stats['hits'] += 1
+            return cached[1]
+        menu_snapshot_stats['misses'] += 1
+        generation = _generations.get(restaurant_id, 0)
+
+    snapshot = build_menu_snapshot(restaurant_id)
+    with _lock:
+        # Don't store a snapshot if the menu changed while it was being built
+        if _generations.get(restaurant_id, 0) == generation:
+            menu_snapshots[restaurant_id] = (version, snapshot)
+    return snapshot
+
+def invalidate_menu_snapshot(restaurant_id):
+    """Drop the menu snapshot for a restaurant after its menu changed."""
+    with _lock:
+        _generations[restaurant_id] = _generations.get(restaurant_id, 0) + 1
+        if menu_snapshots.pop(restaurant_id, None) is not None:
+            menu_snapshot_stats['invalidations'] += 1
+
+def get_menu_cache_stats():
+    """Get hit/miss counters for the menu snapshot cache."""
+    with _lock:
+        lookups = menu_snapshot_stats['hits'] + menu_snapshot_stats['misses']
+        return {
+            **menu_snapshot_stats,
+            'restaurants': len(menu_snapshots),
+            'hit_rate': round(menu_snapshot_stats['hits'] / lookups, 4) if lookups else 0.0
+        }
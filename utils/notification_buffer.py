@@ -0,0 +1,77 @@
+import os
+import time
+import uuid
+from collections import deque
+from threading import Lock
+
+from extensions import socketio
+
+# Recent notifications per Socket.IO room, for clients that reconnect. Events sent
+# through emit_to_room are numbered and buffered by each worker as it delivers
+# them to its own clients (see the client managers in utils/socket_queue.py), so
+# with a message queue every worker buffers every room event, whichever worker
+# sent it. A client that rejoins with the last seq it saw is sent only the newer
+# events. Each room keeps at most NOTIFICATION_BUFFER_SIZE events, none older than
+# NOTIFICATION_BUFFER_TTL. Sequence numbers only mean something to the worker that
+# gave them out, identified by BUFFER_ID; a client that comes back to another
+# worker is told it missed events.
+NOTIFICATION_BUFFER_SIZE = int(os.getenv('NOTIFICATION_BUFFER_SIZE', 100))
+NOTIFICATION_BUFFER_TTL = float(os.getenv('NOTIFICATION_BUFFER_TTL', 15 * 60))  # seconds
+
+BUFFER_ID = uuid.uuid4().hex[:12]
+BUFFERED = '_buffered'  # payload flag set by emit_to_room, removed before delivery
+
+notification_buffers = {}  # room -> {'seq': last seq, 'events': deque of (seq, sent_at, event, data)}
+_lock = Lock()
+
+def _evict_expired(buffer, now):
+    events = buffer['events']
+    while events and now - events[0][1] > NOTIFICATION_BUFFER_TTL:
+        events.popleft()
+
+def record_notification(room, event, data):
+    """Buffer an event for a room and return the payload with its seq added."""
+    now = time.time()
+    with _lock:
+        buffer = notification_buffers.get(room)
+        if buffer is None:
+            buffer = notification_buffers[room] = {'seq': 0, 'events': deque(maxlen=NOTIFICATION_BUFFER_SIZE)}
+        _evict_expired(buffer, now)
+        buffer['seq'] += 1
+        payload = dict(data, seq=buffer['seq'])
+        buffer['events'].append((buffer['seq'], now, event, payload))
+    return payload
+
+def emit_to_room(event, data, room):
+    """Emit an event to a room, to be kept for replay to clients that reconnect."""
+    socketio.emit(event, dict(data, **{BUFFERED: True}), room=room)
+
+def sequence_for_delivery(event, data, room):
+    """The payload to deliver to this worker's clients: buffered events get their seq here."""
+    if not isinstance(room, str) or not isinstance(data, dict) or not data.get(BUFFERED):
+        return data
+    return record_notification(room, event, {key: value for key, value in data.items() if key != BUFFERED})
+
+def current_seq(room):
+    with _lock:
+        buffer = notification_buffers.get(room)
+        return buffer['seq'] if buffer else 0
+
+def events_since(room, last_seq):
+    """
+    The buffered (event, payload) pairs of a room after last_seq, oldest first, and
+    whether some were already evicted, in which case the client should reload.
+    """
+    now = time.time()
+    with _lock:
+        buffer = notification_buffers.get(room)
+        if buffer is None:
+            # Nothing sent since this worker started; a seq from before means a restart
+            return [], last_seq > 0
+        _evict_expired(buffer, now)
+        if last_seq > buffer['seq']:
+            return [], True  # seq from before a restart
+        events = buffer['events']
+        oldest = events[0][0] if events else buffer['seq'] + 1
+        missed = last_seq + 1 < oldest
+        return [(event, payload) for seq, _, event, payload in events if seq > last_seq], missed
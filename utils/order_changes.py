@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from models import db, OrderChange
+
+# The order change log: User.bump_order_version writes one OrderChange per
+# version, so the orders a screen has to refresh are those logged after the
+# version it last saw. Old rows are only needed by screens that were away that
+# long, which get the full list instead; prune them with `flask prune-order-changes`.
+ORDER_CHANGE_RETENTION_DAYS = 7
+
+def changed_order_ids(user_id, since, current_version):
+    """
+    Get (ids of the orders changed after version since, latest version), or
+    (None, current_version) when the log doesn't reach back that far.
+    """
+    if since > current_version:
+        return None, current_version  # version from another database or a reset
+    if since == current_version:
+        return set(), current_version
+
+    rows = db.session.query(OrderChange.version, OrderChange.order_id).filter(
+        OrderChange.user_id == user_id,
+        OrderChange.version > since,
+        # Bumps committed since current_version was read would hide a gap in the count below;
+        # the screen picks them up on its next sync
+        OrderChange.version <= current_version
+    ).all()
+    versions = {version for version, _ in rows}
+    # Every version after since must be logged, else some were pruned or predate the log
+    if len(versions) < current_version - since:
+        return None, current_version
+    return {order_id for _, order_id in rows}, current_version
+
+def prune_order_changes(days=ORDER_CHANGE_RETENTION_DAYS):
+    """Delete change log rows older than days; returns how many were deleted."""
+    deleted = OrderChange.query.filter(
+        OrderChange.changed_at < datetime.utcnow() - timedelta(days=days)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+@click.command('prune-order-changes')
+@click.option('--days', type=int, default=ORDER_CHANGE_RETENTION_DAYS, show_default=True,
+              help='Keep changes from the last days.')
+@with_appcontext
+def prune_order_changes_command(days):
+    """Delete old rows of the order change log used by the order board delta sync."""
+    click.echo(f"Deleted {prune_order_changes(days)} order changes")
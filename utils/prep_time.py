@@ -0,0 +1,205 @@
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+
+from flask import current_app
+from sqlalchemy import func
+from models import db, Order, OrderItem, MenuItem
+
+logger = logging.getLogger(__name__)
+
+# Per-restaurant preparation time model: a ridge regression of the minutes from
+# placing to completing an order on
+#   [1, menu prep minutes (sum of preparation_time x quantity), item count, queue depth]
+# fitted on recent completed orders. Models live in memory and are refit in a
+# background thread once they are older than PREP_REFIT_INTERVAL; until a
+# restaurant has PREP_MIN_SAMPLES completed orders the menu heuristic is used.
+PREP_TRAINING_DAYS = int(os.getenv('PREP_TRAINING_DAYS', 60))
+PREP_MAX_SAMPLES = int(os.getenv('PREP_MAX_SAMPLES', 5000))
+PREP_MIN_SAMPLES = int(os.getenv('PREP_MIN_SAMPLES', 20))
+PREP_REFIT_INTERVAL = float(os.getenv('PREP_REFIT_INTERVAL', 15 * 60))  # seconds
+PREP_RIDGE = 1.0
+MAX_PREP_MINUTES = 240  # longer "completions" are orders someone forgot to close
+
+ACTIVE_STATUSES = ('pending', 'preparing', 'ready')
+
+prep_models = {}  # restaurant_id -> model dict, see fit_prep_model
+_refitting = set()
+_lock = Lock()
+
+def heuristic_minutes(menu_minutes, queue_depth):
+    """The old estimate: menu prep time plus 10% per order already in the queue."""
+    return menu_minutes * (1 + queue_depth * 0.1)
+
+def queue_depths(created, ended):
+    """For each order, the number of other orders still open when it was placed."""
+    import numpy as np
+
+    created_sorted = np.sort(created)
+    ended_sorted = np.sort(ended[~np.isnan(ended)])
+    # Placed before this order, minus those already finished by then
+    return (np.searchsorted(created_sorted, created, side='left')
+            - np.searchsorted(ended_sorted, created, side='right'))
+
+def load_training_data(restaurant_id, now=None):
+    """Get the feature matrix and targets for a restaurant's recent completed orders."""
+    import numpy as np
+
+    since = (now or datetime.utcnow()) - timedelta(days=PREP_TRAINING_DAYS)
+
+    # Every order in the window counts towards queue depth, cancelled ones until their last update
+    orders = db.session.query(
+        Order.id, Order.status, Order.created_at, Order.completed_at, Order.updated_at
+    ).filter(Order.user_id == restaurant_id, Order.created_at >= since).order_by(Order.created_at).all()
+    if not orders:
+        return None, None
+
+    epoch = datetime(1970, 1, 1)
+    def minutes(value):
+        return (value - epoch).total_seconds() / 60.0 if value else np.nan
+
+    created = np.array([minutes(order.created_at) for order in orders])
+    ended = np.array([
+        minutes(order.completed_at) if order.completed_at
+        else minutes(order.updated_at) if order.status not in ACTIVE_STATUSES
+        else np.nan
+        for order in orders
+    ])
+    depths = queue_depths(created, ended)
+
+    # Item mix of each completed order in one grouped query
+    mix = dict(
+        (order_id, (menu_minutes or 0.0, item_count or 0))
+        for order_id, menu_minutes, item_count in db.session.query(
+            OrderItem.order_id,
+            func.sum(OrderItem.quantity * MenuItem.preparation_time),
+            func.sum(OrderItem.quantity)
+        ).join(MenuItem, OrderItem.menu_item_id == MenuItem.id).join(
+            Order, OrderItem.order_id == Order.id
+        ).filter(
+            Order.user_id == restaurant_id,
+            Order.status == 'completed',
+            Order.created_at >= since
+        ).group_by(OrderItem.order_id)
+    )
+
+    rows, targets = [], []
+    for order, depth, start, end in zip(orders, depths, created, ended):
+        if order.status != 'completed' or not order.completed_at or order.id not in mix:
+            continue
+        duration = end - start
+        if not 0 < duration <= MAX_PREP_MINUTES:
+            continue
+        menu_minutes, item_count = mix[order.id]
+        rows.append((1.0, menu_minutes, item_count, depth))
+        targets.append(duration)
+
+    if not rows:
+        return None, None
+    # Most recent orders win when there are too many
+    return np.array(rows[-PREP_MAX_SAMPLES:]), np.array(targets[-PREP_MAX_SAMPLES:])
+
+def fit_prep_model(restaurant_id):
+    """Fit a restaurant's model from its order history; returns None without enough data."""
+    import numpy as np
+
+    features, targets = load_training_data(restaurant_id)
+    if features is None or len(targets) < PREP_MIN_SAMPLES:
+        return None
+
+    # Ridge regression, leaving the intercept unpenalized
+    penalty = PREP_RIDGE * np.eye(features.shape[1])
+    penalty[0, 0] = 0.0
+    coef = np.linalg.solve(features.T @ features + penalty, features.T @ targets)
+
+    predictions = np.clip(features @ coef, 1, MAX_PREP_MINUTES)
+    baseline = heuristic_minutes(features[:, 1], features[:, 3])
+    return {
+        'coef': [float(value) for value in coef],
+        'samples': int(len(targets)),
+        'mae': round(float(np.mean(np.abs(predictions - targets))), 2),
+        'heuristic_mae': round(float(np.mean(np.abs(baseline - targets))), 2),
+        'fitted_at': time.time()
+    }
+
+def _refit(app, restaurant_id):
+    """Fit a model in the background and swap it in."""
+    try:
+        with app.app_context():
+            model = fit_prep_model(restaurant_id)
+        with _lock:
+            if model is not None:
+                prep_models[restaurant_id] = model
+            else:
+                # Not enough history yet, check again after the next interval
+                prep_models[restaurant_id] = {'coef': None, 'samples': 0, 'fitted_at': time.time()}
+        if model is not None:
+            logger.info(f"Prep time model for restaurant {restaurant_id}: {model['samples']} orders, "
+                        f"MAE {model['mae']} min (menu heuristic {model['heuristic_mae']} min)")
+    except Exception as e:
+        logger.warning(f"Could not fit prep time model for restaurant {restaurant_id}: {e}")
+    finally:
+        with _lock:
+            _refitting.discard(restaurant_id)
+
+def get_prep_model(restaurant_id, app=None):
+    """
+    Get a restaurant's model from memory, starting a background refit when it
+    is missing or older than PREP_REFIT_INTERVAL. Returns None until one is fitted.
+    """
+    with _lock:
+        model = prep_models.get(restaurant_id)
+        stale = model is None or time.time() - model['fitted_at'] > PREP_REFIT_INTERVAL
+        start = stale and app is not None and restaurant_id not in _refitting
+        if start:
+            _refitting.add(restaurant_id)
+    if start:
+        Thread(target=_refit, args=(app, restaurant_id), daemon=True, name=f'prep-fit-{restaurant_id}').start()
+    return model if model and model['coef'] is not None else None
+
+def predict_minutes(model, menu_minutes, item_count, queue_depth):
+    """Estimated minutes until an order is ready; falls back to the menu heuristic."""
+    if model is None or model['mae'] > model['heuristic_mae']:
+        estimate = heuristic_minutes(menu_minutes, queue_depth)
+    else:
+        intercept, per_menu_minute, per_item, per_queued_order = model['coef']
+        estimate = intercept + per_menu_minute * menu_minutes + per_item * item_count + per_queued_order * queue_depth
+    return max(1, min(round(estimate), MAX_PREP_MINUTES))
+
+def get_queue_depth(restaurant_id, placed_before=None):
+    """Orders waiting in a restaurant's kitchen, optionally only those placed before a time."""
+    query = Order.query.filter(Order.user_id == restaurant_id, Order.status.in_(ACTIVE_STATUSES))
+    if placed_before is not None:
+        query = query.filter(Order.created_at < placed_before)
+    return query.count()
+
+def estimate_order_minutes(order, menu_minutes=None, item_count=None):
+    """
+    Estimated minutes from placing an order until it is ready. Pass the menu prep
+    minutes and item count when they are already known to skip the item query.
+    """
+    if menu_minutes is None or item_count is None:
+        menu_minutes, item_count = db.session.query(
+            func.coalesce(func.sum(OrderItem.quantity * MenuItem.preparation_time), 0),
+            func.coalesce(func.sum(OrderItem.quantity), 0)
+        ).join(MenuItem, OrderItem.menu_item_id == MenuItem.id).filter(OrderItem.order_id == order.id).one()
+
+    queue_depth = get_queue_depth(order.user_id, placed_before=order.created_at)
+    model = get_prep_model(order.user_id, current_app._get_current_object())
+    return predict_minutes(model, menu_minutes, item_count, queue_depth)
+
+def get_prep_model_stats(restaurant_id):
+    """Describe the restaurant's current model for the ETA endpoints."""
+    with _lock:
+        model = prep_models.get(restaurant_id)
+    if not model or model['coef'] is None:
+        return {'kind': 'menu', 'samples': model['samples'] if model else 0}
+    return {
+        'kind': 'learned' if model['mae'] <= model['heuristic_mae'] else 'menu',
+        'samples': model['samples'],
+        'mae_minutes': model['mae'],
+        'heuristic_mae_minutes': model['heuristic_mae'],
+        'fitted_at': datetime.utcfromtimestamp(model['fitted_at']).isoformat()
+    }
@@ -0,0 +1,71 @@
+import os
+import time
+import atexit
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+
+# Prometheus metrics for HTTP requests, SQL queries, Socket.IO and AI calls.
+# With several workers set PROMETHEUS_MULTIPROC_DIR (an empty directory, cleared
+# on every deploy) in the environment of all of them before they start: each
+# worker then writes its samples there and /metrics adds up all the workers.
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'blueprint', 'endpoint', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'SQL statement execution time',
+    ['operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
+SOCKETIO_CONNECTED_CLIENTS = Gauge(
+    'socketio_connected_clients', 'Socket.IO clients connected', multiprocess_mode='livesum'
+)
+SOCKETIO_EMITS = Counter('socketio_emits_total', 'Socket.IO events emitted', ['event'])
+AI_CALL_DURATION = Histogram(
+    'ai_call_duration_seconds', 'Model and OCR call latency',
+    ['backend', 'operation'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+AI_CALL_ERRORS = Counter('ai_call_errors_total', 'Model and OCR calls that raised', ['backend', 'operation'])
+
+SQL_OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+if MULTIPROC_DIR:
+    @atexit.register
+    def _mark_process_dead():
+        # Drop this worker's live gauges (connected clients) from the totals
+        multiprocess.mark_process_dead(os.getpid())
+
+def observe_request(method, blueprint, endpoint, status_code, seconds):
+    HTTP_REQUEST_DURATION.labels(method, blueprint or '', endpoint, str(status_code)).observe(seconds)
+
+def observe_query(statement, seconds):
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERY_DURATION.labels(operation if operation in SQL_OPERATIONS else 'OTHER').observe(seconds)
+
+@contextmanager
+def time_ai_call(backend, operation):
+    """Time a model or OCR call, counting it as an error if it raises."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        AI_CALL_ERRORS.labels(backend, operation).inc()
+        raise
+    finally:
+        AI_CALL_DURATION.labels(backend, operation).observe(time.perf_counter() - started_at)
+
+def render_metrics():
+    """The metrics of every worker in the Prometheus text format, with its content type."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
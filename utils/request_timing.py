@@ -0,0 +1,135 @@
+import os
+import time
+import logging
+from threading import Lock
+
+from flask import g, request, has_app_context, before_render_template, template_rendered
+from sqlalchemy import event
+from utils.prometheus import observe_request, observe_query
+
+logger = logging.getLogger(__name__)
+
+# Per-request cost: SQL statements and time spent in them, template rendering and
+# total latency, summed per endpoint for this worker. Requests slower than
+# SLOW_REQUEST_MS are logged with their breakdown, and SERVER_TIMING=1 adds a
+# Server-Timing header so the numbers show up in the browser's network panel.
+# Latency and query durations also go to the Prometheus histograms (utils/prometheus.py).
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+endpoint_stats = {}  # endpoint -> totals, see _record
+_lock = Lock()
+
+def _current_timing():
+    """The timing of the request being handled, or None outside a request (jobs, CLI)."""
+    return g.get('request_timing') if has_app_context() else None
+
+def instrument_engine(engine):
+    """Count statements and time spent in the database for the current request."""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's own context, so a statement that raises leaves nothing behind
+        context._query_started_at = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started_at
+        observe_query(statement, elapsed)
+        timing = _current_timing()
+        if timing is not None:
+            timing['queries'] += 1
+            timing['db_time'] += elapsed
+
+def _start_template(sender, template, context, **extra):
+    timing = _current_timing()
+    if timing is not None:
+        timing['template_stack'].append(time.perf_counter())
+
+def _end_template(sender, template, context, **extra):
+    timing = _current_timing()
+    if timing is not None and timing['template_stack']:
+        elapsed = time.perf_counter() - timing['template_stack'].pop()
+        # Included templates are rendered inside their parent, count the outermost only
+        if not timing['template_stack']:
+            timing['template_time'] += elapsed
+
+def _before_request():
+    g.request_timing = {
+        'started_at': time.perf_counter(),
+        'queries': 0,
+        'db_time': 0.0,
+        'template_time': 0.0,
+        'template_stack': []
+    }
+
+def _record(endpoint, status_code, total_ms, db_ms, queries, template_ms):
+    with _lock:
+        stats = endpoint_stats.get(endpoint)
+        if stats is None:
+            stats = endpoint_stats[endpoint] = {
+                'requests': 0, 'errors': 0, 'slow': 0, 'queries': 0, 'queries_max': 0,
+                'total_ms': 0.0, 'total_ms_max': 0.0, 'db_ms': 0.0, 'template_ms': 0.0
+            }
+        stats['requests'] += 1
+        stats['errors'] += status_code >= 500
+        stats['slow'] += total_ms >= SLOW_REQUEST_MS
+        stats['queries'] += queries
+        stats['queries_max'] = max(stats['queries_max'], queries)
+        stats['total_ms'] += total_ms
+        stats['total_ms_max'] = max(stats['total_ms_max'], total_ms)
+        stats['db_ms'] += db_ms
+        stats['template_ms'] += template_ms
+
+def _after_request(response):
+    timing = g.pop('request_timing', None)
+    if timing is None:
+        return response
+
+    total_ms = (time.perf_counter() - timing['started_at']) * 1000
+    db_ms = timing['db_time'] * 1000
+    template_ms = timing['template_time'] * 1000
+    endpoint = request.endpoint or 'unmatched'
+    _record(endpoint, response.status_code, total_ms, db_ms, timing['queries'], template_ms)
+    observe_request(request.method, request.blueprint, endpoint, response.status_code, total_ms / 1000)
+
+    if total_ms >= SLOW_REQUEST_MS:
+        logger.warning(f"Slow request {request.method} {request.path} ({endpoint}) -> {response.status_code}: "
+                       f"{total_ms:.0f} ms, {timing['queries']} queries in {db_ms:.0f} ms, "
+                       f"templates {template_ms:.0f} ms")
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{timing["queries"]} queries", '
+            f'tpl;dur={template_ms:.1f}, '
+            f'app;dur={total_ms:.1f}'
+        )
+    return response
+
+def init_request_timing(app, engine):
+    """Time every request of the app and the database work done for it."""
+    instrument_engine(engine)
+    before_render_template.connect(_start_template, app)
+    template_rendered.connect(_end_template, app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+def get_endpoint_stats():
+    """Per-endpoint totals and averages for this worker, slowest on average first."""
+    with _lock:
+        snapshot = {endpoint: dict(stats) for endpoint, stats in endpoint_stats.items()}
+
+    rows = []
+    for endpoint, stats in snapshot.items():
+        requests = stats['requests']
+        rows.append({
+            'endpoint': endpoint,
+            'requests': requests,
+            'errors': stats['errors'],
+            'slow': stats['slow'],
+            'avg_ms': round(stats['total_ms'] / requests, 2),
+            'max_ms': round(stats['total_ms_max'], 2),
+            'avg_db_ms': round(stats['db_ms'] / requests, 2),
+            'avg_template_ms': round(stats['template_ms'] / requests, 2),
+            'avg_queries': round(stats['queries'] / requests, 2),
+            'max_queries': stats['queries_max']
+        })
+    return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)
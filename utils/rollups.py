@@ -0,0 +1,185 @@
+from datetime import date
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Order, OrderItem, MenuItem, Feedback, DailySales, DailyItemSales
+
+# Dashboard rollups: completed orders summed per restaurant x day (DailySales) and
+# per restaurant x day x menu item (DailyItemSales). An order counts towards the
+# rollups while its status is 'completed' or 'paid', on the day it was placed.
+
+# Paying a completed order moves it to 'paid', which must not take it out of the sales
+COMPLETED_STATUSES = ('completed', 'paid')
+
+SALES_KEYS = ('user_id', 'day')
+ITEM_KEYS = ('user_id', 'day', 'menu_item_id')
+ITEM_LABELS = ('name', 'category')
+
+def _as_date(value):
+    """func.date() gives a string on SQLite and a date elsewhere."""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _increment(model, keys, rows):
+    """Add the counters in rows to the matching rollup rows, creating missing ones."""
+    if not rows:
+        return
+    counters = [name for name in rows[0] if name not in keys and name not in ITEM_LABELS]
+    labels = [name for name in rows[0] if name in ITEM_LABELS]
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(model)
+        columns = model.__table__.c
+        set_ = {name: columns[name] + insert.excluded[name] for name in counters}
+        # Labels follow the menu item as it was at the latest completion
+        set_.update({name: insert.excluded[name] for name in labels})
+        db.session.execute(insert.on_conflict_do_update(index_elements=list(keys), set_=set_), rows)
+        return
+
+    # Other databases: read-modify-write inside the caller's transaction
+    for row in rows:
+        existing = model.query.filter_by(**{key: row[key] for key in keys}).first()
+        if existing is None:
+            db.session.add(model(**row))
+            continue
+        for name in counters:
+            setattr(existing, name, getattr(existing, name) + row[name])
+        for name in labels:
+            setattr(existing, name, row[name])
+
+def apply_completed_order(order, sign=1):
+    """Add a completed order to the rollups, or take it out again with sign=-1."""
+    day = order.created_at.date()
+    lines = db.session.query(OrderItem, MenuItem).outerjoin(
+        MenuItem, OrderItem.menu_item_id == MenuItem.id
+    ).filter(OrderItem.order_id == order.id).all()
+
+    items = {}
+    for order_item, menu_item in lines:
+        row = items.setdefault(order_item.menu_item_id, {
+            'user_id': order.user_id,
+            'day': day,
+            'menu_item_id': order_item.menu_item_id,
+            'name': menu_item.name if menu_item else 'Unknown',
+            'category': menu_item.category if menu_item else None,
+            'quantity': 0,
+            'order_lines': 0,
+            'revenue': 0.0
+        })
+        row['quantity'] += sign * order_item.quantity
+        row['order_lines'] += sign
+        row['revenue'] += sign * order_item.quantity * order_item.unit_price
+
+    _increment(DailySales, SALES_KEYS, [{
+        'user_id': order.user_id,
+        'day': day,
+        'order_count': sign,
+        'item_count': sum(row['quantity'] for row in items.values()),
+        'sales_total': sign * (order.total_amount or 0),
+        'tax_total': sign * (order.tax_amount or 0),
+        'rating_count': 0,
+        'rating_total': 0
+    }])
+    _increment(DailyItemSales, ITEM_KEYS, list(items.values()))
+
+def update_rollups_for_status(order, old_status, new_status):
+    """Keep the rollups in step when an order moves into or out of the completed statuses."""
+    was_completed = old_status in COMPLETED_STATUSES
+    is_completed = new_status in COMPLETED_STATUSES
+    if is_completed and not was_completed:
+        apply_completed_order(order)
+    elif was_completed and not is_completed:
+        apply_completed_order(order, sign=-1)
+
+def apply_feedback(order, rating):
+    """Add a feedback rating to the rollup of the day the order was placed."""
+    _increment(DailySales, SALES_KEYS, [{
+        'user_id': order.user_id,
+        'day': order.created_at.date(),
+        'order_count': 0,
+        'item_count': 0,
+        'sales_total': 0.0,
+        'tax_total': 0.0,
+        'rating_count': 1,
+        'rating_total': rating
+    }])
+
+def rebuild_rollups(user_id=None):
+    """
+    Recompute the rollups from the order history, for one restaurant or all of them.
+    Returns the number of daily and item rows written.
+    """
+    restaurant_filter = [Order.user_id == user_id] if user_id is not None else []
+    DailySales.query.filter(*([DailySales.user_id == user_id] if user_id is not None else [])).delete()
+    DailyItemSales.query.filter(*([DailyItemSales.user_id == user_id] if user_id is not None else [])).delete()
+
+    day = func.date(Order.created_at)
+    completed = [Order.status.in_(COMPLETED_STATUSES)] + restaurant_filter
+
+    daily = {}
+    for row_user_id, row_day, order_count, sales_total, tax_total in db.session.query(
+        Order.user_id, day, func.count(Order.id), func.sum(Order.total_amount), func.sum(Order.tax_amount)
+    ).filter(*completed).group_by(Order.user_id, day):
+        daily[(row_user_id, _as_date(row_day))] = {
+            'user_id': row_user_id,
+            'day': _as_date(row_day),
+            'order_count': order_count,
+            'item_count': 0,
+            'sales_total': sales_total or 0.0,
+            'tax_total': tax_total or 0.0,
+            'rating_count': 0,
+            'rating_total': 0
+        }
+
+    item_rows = []
+    for row_user_id, row_day, menu_item_id, name, category, quantity, order_lines, revenue in db.session.query(
+        Order.user_id, day, OrderItem.menu_item_id, MenuItem.name, MenuItem.category,
+        func.sum(OrderItem.quantity), func.count(OrderItem.id), func.sum(OrderItem.quantity * OrderItem.unit_price)
+    ).join(OrderItem, OrderItem.order_id == Order.id).outerjoin(
+        MenuItem, OrderItem.menu_item_id == MenuItem.id
+    ).filter(*completed).group_by(Order.user_id, day, OrderItem.menu_item_id, MenuItem.name, MenuItem.category):
+        item_rows.append({
+            'user_id': row_user_id,
+            'day': _as_date(row_day),
+            'menu_item_id': menu_item_id,
+            'name': name or 'Unknown',
+            'category': category,
+            'quantity': quantity or 0,
+            'order_lines': order_lines,
+            'revenue': revenue or 0.0
+        })
+        daily[(row_user_id, _as_date(row_day))]['item_count'] += quantity or 0
+
+    # Feedback counts for any order, like apply_feedback
+    for row_user_id, row_day, rating_count, rating_total in db.session.query(
+        Order.user_id, day, func.count(Feedback.id), func.sum(Feedback.rating)
+    ).join(Feedback, Feedback.order_id == Order.id).filter(*restaurant_filter).group_by(Order.user_id, day):
+        row = daily.setdefault((row_user_id, _as_date(row_day)), {
+            'user_id': row_user_id,
+            'day': _as_date(row_day),
+            'order_count': 0,
+            'item_count': 0,
+            'sales_total': 0.0,
+            'tax_total': 0.0,
+            'rating_count': 0,
+            'rating_total': 0
+        })
+        row['rating_count'] = rating_count
+        row['rating_total'] = rating_total or 0
+
+    if daily:
+        db.session.execute(db.insert(DailySales), list(daily.values()))
+    if item_rows:
+        db.session.execute(db.insert(DailyItemSales), item_rows)
+    db.session.commit()
+    return len(daily), len(item_rows)
+
+@click.command('rebuild-rollups')
+@click.option('--restaurant-id', type=int, default=None, help='Only rebuild this restaurant.')
+@with_appcontext
+def rebuild_rollups_command(restaurant_id):
+    """Rebuild the dashboard sales rollups from the order history."""
+    daily_rows, item_rows = rebuild_rollups(restaurant_id)
+    click.echo(f"Rebuilt {daily_rows} daily and {item_rows} item rollup rows")
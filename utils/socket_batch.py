@@ -0,0 +1,62 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from extensions import socketio
+from utils.notification_buffer import emit_to_room
+
+# Order events are held per room for SOCKETIO_BATCH_WINDOW seconds so a burst of
+# status changes reaches each screen as one frame. Within a window a later status
+# of the same order replaces the earlier one; restaurant rooms get a single
+# 'order_updates' frame and table rooms one 'notification' per order.
+# A window of 0 sends everything straight away.
+SOCKETIO_BATCH_WINDOW = float(os.getenv('SOCKETIO_BATCH_WINDOW', 0.05))
+
+pending_batches = {}  # room -> {'order_updates': {order_id: update}, 'notifications': {order_id: notification}}
+_lock = Lock()
+
+def _queue(room, kind, order_id, payload, merge=None):
+    with _lock:
+        batch = pending_batches.get(room)
+        start_timer = batch is None
+        if start_timer:
+            batch = pending_batches[room] = {'order_updates': OrderedDict(), 'notifications': OrderedDict()}
+        previous = batch[kind].pop(order_id, None)  # re-queued at the end, in order of the latest change
+        batch[kind][order_id] = merge(previous, payload) if merge and previous else payload
+
+    if SOCKETIO_BATCH_WINDOW <= 0:
+        flush_room(room)
+    elif start_timer:
+        socketio.start_background_task(_flush_later, room)
+
+def _merge_update(previous, update):
+    """The latest status wins, but the screen still learns where the order came from."""
+    return dict(update, previous_status=previous.get('previous_status', update.get('previous_status')))
+
+def queue_order_update(room, update):
+    """Queue an order status change for a restaurant room's next order_updates frame."""
+    _queue(room, 'order_updates', update['id'], update, merge=_merge_update)
+
+def queue_order_notification(room, order_id, notification):
+    """Queue a customer notification about an order; a newer one for the same order replaces it."""
+    _queue(room, 'notifications', order_id, notification)
+
+def _flush_later(room):
+    socketio.sleep(SOCKETIO_BATCH_WINDOW)
+    flush_room(room)
+
+def flush_room(room):
+    """Send everything queued for a room now."""
+    with _lock:
+        batch = pending_batches.pop(room, None)
+    if not batch:
+        return
+    if batch['order_updates']:
+        updates = list(batch['order_updates'].values())
+        versions = [update['version'] for update in updates if update.get('version') is not None]
+        emit_to_room('order_updates', {
+            'updates': updates,
+            'version': max(versions) if versions else None  # order board version after the batch
+        }, room)
+    for notification in batch['notifications'].values():
+        emit_to_room('notification', notification, room)
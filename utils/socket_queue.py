@@ -0,0 +1,402 @@
+import os
+import time
+import sqlite3
+import uuid
+import atexit
+import logging
+from threading import Lock, local
+
+import socketio
+from sqlalchemy.engine import make_url
+from extensions import socketio as flask_socketio
+from utils.notification_buffer import sequence_for_delivery
+
+logger = logging.getLogger(__name__)
+
+# Cross-process Socket.IO. With SOCKETIO_MESSAGE_QUEUE set every worker publishes
+# its emits to the queue and delivers the ones of the other workers to its own
+# clients, so N workers behind a load balancer reach every subscribed screen.
+#   redis://, rediss://, kafka://, zmq+..., amqp:// - Flask-SocketIO's own managers
+#   sqlite:///path/to/queue.db - SQLiteQueueManager below, for tests and single-host setups
+# Room presence (which sockets sit in which room) is shared through the same
+# backend for redis and sqlite, and kept per process otherwise. Every store
+# indexes both directions (room -> sids and sid -> rooms), so joins, disconnects
+# and occupancy counts never scan other rooms or sockets. Shared stores also tag
+# each socket with its worker, which heartbeats while it has sockets; a worker
+# that is killed or crashes (no atexit) has its sockets pruned by the others once
+# its heartbeat is SOCKETIO_PRESENCE_TTL old.
+SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
+SOCKETIO_QUEUE_POLL = float(os.getenv('SOCKETIO_QUEUE_POLL', 0.05))  # seconds between polls of the sqlite queue
+SOCKETIO_QUEUE_RETENTION = float(os.getenv('SOCKETIO_QUEUE_RETENTION', 60))  # seconds sqlite messages are kept
+SOCKETIO_PRESENCE_TTL = float(os.getenv('SOCKETIO_PRESENCE_TTL', 60))  # seconds without a heartbeat before a worker's sockets are dropped
+
+def sqlite_queue_path(url):
+    path = make_url(url).database
+    if not path or path == ':memory:':
+        raise ValueError('The sqlite message queue needs a file shared by all workers')
+    return path
+
+def _connect_sqlite(path):
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+class SQLiteQueueManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager that passes messages between processes through a
+    SQLite table. Publishing is one INSERT; each worker polls for rows newer than
+    the last one it has seen. Meant for tests and small single-host deployments.
+    """
+    name = 'sqlite'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None, json=None):
+        self.path = sqlite_queue_path(url)
+        self._local = local()
+        self._trimmed_at = 0.0
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS socketio_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_socketio_messages_created_at ON socketio_messages (created_at);
+        """)
+
+    def _connection(self):
+        """One connection per thread; the listener runs in its own background task."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = _connect_sqlite(self.path)
+        return connection
+
+    def _publish(self, data):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            'INSERT INTO socketio_messages (channel, created_at, payload) VALUES (?, ?, ?)',
+            (self.channel, now, self.json.dumps(data))
+        )
+        # Every worker has seen a message long before it expires
+        if now - self._trimmed_at > SOCKETIO_QUEUE_RETENTION / 2:
+            self._trimmed_at = now
+            connection.execute('DELETE FROM socketio_messages WHERE created_at < ?',
+                               (now - SOCKETIO_QUEUE_RETENTION,))
+
+    def _listen(self):
+        connection = self._connection()
+        # Only messages published after this worker started
+        last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM socketio_messages').fetchone()[0]
+        while True:
+            rows = connection.execute(
+                'SELECT id, payload FROM socketio_messages WHERE id > ? AND channel = ? ORDER BY id',
+                (last_id, self.channel)
+            ).fetchall()
+            for message_id, payload in rows:
+                last_id = message_id
+                yield payload
+            if not rows:
+                self.server.sleep(SOCKETIO_QUEUE_POLL)
+
+class SequencedManager(socketio.Manager):
+    """Single-process client manager that numbers buffered room events as it delivers them."""
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        room = to or room
+        return super().emit(event, sequence_for_delivery(event, data, room), namespace,
+                            room=room, skip_sid=skip_sid, callback=callback, **kwargs)
+
+def sequenced(manager_class):
+    """
+    A message queue manager that numbers buffered room events when it delivers them
+    to its own clients, for messages from this worker and from the others alike.
+    """
+    class Sequenced(manager_class):
+        def _handle_emit(self, message):
+            data = message['data']
+            if not message.get('binary') and isinstance(data, list) and len(data) == 1:
+                message = dict(message, data=[sequence_for_delivery(message['event'], data[0], message['room'])])
+            return super()._handle_emit(message)
+
+    Sequenced.__name__ = f'Sequenced{manager_class.__name__}'
+    return Sequenced
+
+def queue_manager_class(message_queue):
+    """The python-socketio manager for a message queue URL, as Flask-SocketIO would pick it."""
+    if message_queue.startswith('sqlite:'):
+        return SQLiteQueueManager
+    if message_queue.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager
+    if message_queue.startswith('kafka://'):
+        return socketio.KafkaManager
+    if message_queue.startswith('zmq'):
+        return socketio.ZmqManager
+    return socketio.KombuManager
+
+def socketio_options(message_queue, channel=SOCKETIO_CHANNEL):
+    """Keyword arguments for socketio.init_app for the configured message queue."""
+    if not message_queue:
+        return {'client_manager': SequencedManager()}
+    manager_class = sequenced(queue_manager_class(message_queue))
+    return {'client_manager': manager_class(message_queue, channel=channel)}
+
+# ===== Presence =====
+class LocalPresence:
+    """Room membership of this process's sockets."""
+    def __init__(self):
+        self._rooms = {}  # room -> set of sids
+        self._sids = {}  # sid -> set of rooms
+        self._lock = Lock()
+
+    def join(self, sid, room):
+        with self._lock:
+            self._rooms.setdefault(room, set()).add(sid)
+            self._sids.setdefault(sid, set()).add(room)
+
+    def leave(self, sid, room):
+        with self._lock:
+            self._discard(sid, room)
+
+    def _discard(self, sid, room):
+        members = self._rooms.get(room)
+        if members is not None:
+            members.discard(sid)
+            if not members:
+                del self._rooms[room]
+        rooms = self._sids.get(sid)
+        if rooms is not None:
+            rooms.discard(room)
+            if not rooms:
+                del self._sids[sid]
+
+    def drop(self, sid):
+        """Forget a disconnected socket, returning the rooms it was in."""
+        with self._lock:
+            rooms = set(self._sids.get(sid, ()))
+            for room in rooms:
+                self._discard(sid, room)
+            return rooms
+
+    def members(self, room):
+        with self._lock:
+            return set(self._rooms.get(room, ()))
+
+    def rooms(self, sid):
+        with self._lock:
+            return set(self._sids.get(sid, ()))
+
+    def counts(self, rooms):
+        """Number of sockets in each of the rooms, without listing them."""
+        with self._lock:
+            return {room: len(self._rooms.get(room, ())) for room in rooms}
+
+class SharedPresence:
+    """Heartbeat of a worker in a shared presence store, started with its first socket."""
+    def _init_heartbeat(self):
+        self._heartbeat_started = False
+        self._heartbeat_lock = Lock()
+
+    def _start_heartbeat(self):
+        if self._heartbeat_started:
+            return
+        with self._heartbeat_lock:
+            if self._heartbeat_started:
+                return
+            self.heartbeat()  # registered before its first socket is
+            flask_socketio.start_background_task(self._heartbeat_loop)
+            self._heartbeat_started = True
+
+    def _heartbeat_loop(self):
+        while True:
+            flask_socketio.sleep(SOCKETIO_PRESENCE_TTL / 3)
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Socket presence heartbeat of {self.host_id} failed: {e}")
+
+class SQLitePresence(SharedPresence):
+    """Room membership shared by the workers through the sqlite message queue file."""
+    def __init__(self, url):
+        self.path = sqlite_queue_path(url)
+        self.host_id = f'{os.getpid()}-{id(self)}'
+        self._local = local()
+        self._init_heartbeat()
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS socketio_presence (
+                sid TEXT NOT NULL,
+                room TEXT NOT NULL,
+                host_id TEXT NOT NULL,
+                PRIMARY KEY (sid, room)
+            );
+            CREATE INDEX IF NOT EXISTS ix_socketio_presence_room ON socketio_presence (room);
+            CREATE INDEX IF NOT EXISTS ix_socketio_presence_host_id ON socketio_presence (host_id);
+            CREATE TABLE IF NOT EXISTS socketio_presence_hosts (
+                host_id TEXT PRIMARY KEY,
+                seen_at REAL NOT NULL
+            );
+        """)
+        # Sockets of this worker die with it; heartbeat() covers the exits that skip this
+        atexit.register(self.clear_host)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = _connect_sqlite(self.path)
+        return connection
+
+    def join(self, sid, room):
+        self._start_heartbeat()
+        self._connection().execute(
+            'INSERT OR REPLACE INTO socketio_presence (sid, room, host_id) VALUES (?, ?, ?)',
+            (sid, room, self.host_id)
+        )
+
+    def leave(self, sid, room):
+        self._connection().execute('DELETE FROM socketio_presence WHERE sid = ? AND room = ?', (sid, room))
+
+    def drop(self, sid):
+        connection = self._connection()
+        rooms = {row[0] for row in connection.execute('SELECT room FROM socketio_presence WHERE sid = ?', (sid,))}
+        connection.execute('DELETE FROM socketio_presence WHERE sid = ?', (sid,))
+        return rooms
+
+    def members(self, room):
+        return {row[0] for row in self._connection().execute(
+            'SELECT sid FROM socketio_presence WHERE room = ?', (room,))}
+
+    def rooms(self, sid):
+        return {row[0] for row in self._connection().execute(
+            'SELECT room FROM socketio_presence WHERE sid = ?', (sid,))}
+
+    def counts(self, rooms):
+        rooms = list(rooms)
+        counts = dict.fromkeys(rooms, 0)
+        if rooms:
+            counts.update(self._connection().execute(
+                f"SELECT room, COUNT(*) FROM socketio_presence WHERE room IN ({', '.join('?' * len(rooms))}) GROUP BY room",
+                rooms
+            ).fetchall())
+        return counts
+
+    def heartbeat(self):
+        """Mark this worker alive and drop the sockets of workers that stopped beating."""
+        now = time.time()
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO socketio_presence_hosts (host_id, seen_at) VALUES (?, ?)',
+                           (self.host_id, now))
+        connection.execute('DELETE FROM socketio_presence_hosts WHERE seen_at < ?', (now - SOCKETIO_PRESENCE_TTL,))
+        connection.execute('DELETE FROM socketio_presence WHERE host_id NOT IN '
+                           '(SELECT host_id FROM socketio_presence_hosts)')
+
+    def clear_host(self):
+        try:
+            connection = self._connection()
+            connection.execute('DELETE FROM socketio_presence WHERE host_id = ?', (self.host_id,))
+            connection.execute('DELETE FROM socketio_presence_hosts WHERE host_id = ?', (self.host_id,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not clear socket presence of {self.host_id}: {e}")
+
+class RedisPresence(SharedPresence):
+    """
+    Room membership shared by the workers as Redis sets, in both directions. Each
+    worker also keeps the set of its sids and an alive key that expires unless
+    its heartbeat renews it.
+    """
+    def __init__(self, url, channel=SOCKETIO_CHANNEL):
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = f'{channel}:presence'
+        self.host_id = uuid.uuid4().hex
+        self._init_heartbeat()
+        atexit.register(self.clear_host)
+
+    def join(self, sid, room):
+        self._start_heartbeat()
+        pipe = self.redis.pipeline()
+        pipe.sadd(f'{self.prefix}:room:{room}', sid)
+        pipe.sadd(f'{self.prefix}:sid:{sid}', room)
+        pipe.sadd(f'{self.prefix}:host:{self.host_id}:sids', sid)
+        pipe.execute()
+
+    def leave(self, sid, room):
+        pipe = self.redis.pipeline()
+        pipe.srem(f'{self.prefix}:room:{room}', sid)
+        pipe.srem(f'{self.prefix}:sid:{sid}', room)
+        pipe.execute()
+
+    def drop(self, sid):
+        rooms = self._drop_sids([sid]).get(sid, set())
+        self.redis.srem(f'{self.prefix}:host:{self.host_id}:sids', sid)
+        return rooms
+
+    def _drop_sids(self, sids):
+        """Remove sockets from every room they joined; returns sid -> rooms."""
+        pipe = self.redis.pipeline()
+        for sid in sids:
+            pipe.smembers(f'{self.prefix}:sid:{sid}')
+        dropped = dict(zip(sids, pipe.execute()))
+        pipe = self.redis.pipeline()
+        for sid, rooms in dropped.items():
+            for room in rooms:
+                pipe.srem(f'{self.prefix}:room:{room}', sid)
+            pipe.delete(f'{self.prefix}:sid:{sid}')
+        pipe.execute()
+        return dropped
+
+    def members(self, room):
+        return set(self.redis.smembers(f'{self.prefix}:room:{room}'))
+
+    def rooms(self, sid):
+        return set(self.redis.smembers(f'{self.prefix}:sid:{sid}'))
+
+    def counts(self, rooms):
+        rooms = list(rooms)
+        pipe = self.redis.pipeline()
+        for room in rooms:
+            pipe.scard(f'{self.prefix}:room:{room}')
+        return dict(zip(rooms, pipe.execute()))
+
+    def _drop_host(self, host_id):
+        sids = list(self.redis.smembers(f'{self.prefix}:host:{host_id}:sids'))
+        self._drop_sids(sids)
+        pipe = self.redis.pipeline()
+        pipe.delete(f'{self.prefix}:host:{host_id}:sids', f'{self.prefix}:host:{host_id}:alive')
+        pipe.srem(f'{self.prefix}:hosts', host_id)
+        pipe.execute()
+
+    def heartbeat(self):
+        """Renew this worker's alive key and drop the sockets of workers whose key expired."""
+        pipe = self.redis.pipeline()
+        pipe.set(f'{self.prefix}:host:{self.host_id}:alive', 1, ex=max(int(SOCKETIO_PRESENCE_TTL), 1))
+        pipe.sadd(f'{self.prefix}:hosts', self.host_id)
+        pipe.execute()
+        for host_id in self.redis.smembers(f'{self.prefix}:hosts'):
+            if not self.redis.exists(f'{self.prefix}:host:{host_id}:alive'):
+                logger.info(f"Dropping socket presence of stopped worker {host_id}")
+                self._drop_host(host_id)
+
+    def clear_host(self):
+        try:
+            self._drop_host(self.host_id)
+        except Exception as e:
+            logger.warning(f"Could not clear socket presence of {self.host_id}: {e}")
+
+presence = LocalPresence()
+
+def configure_presence(message_queue, channel=SOCKETIO_CHANNEL):
+    """Share room presence through the message queue backend where it can hold it."""
+    global presence
+    if message_queue and message_queue.startswith('sqlite:'):
+        presence = SQLitePresence(message_queue)
+    elif message_queue and message_queue.startswith(('redis://', 'rediss://')):
+        presence = RedisPresence(message_queue, channel)
+    else:
+        if message_queue:
+            logger.warning('Socket presence is per worker with this message queue')
+        presence = LocalPresence()
+    return presence
+
+def get_presence():
+    return presence
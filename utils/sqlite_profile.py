@@ -0,0 +1,94 @@
+import os
+import time
+import random
+import logging
+from functools import wraps
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Retries for write paths that hit "database is locked" once busy_timeout has run out
+SQLITE_LOCK_RETRIES = int(os.getenv('SQLITE_LOCK_RETRIES', 5))
+SQLITE_LOCK_BACKOFF = float(os.getenv('SQLITE_LOCK_BACKOFF', 0.05))  # seconds, doubled per retry
+
+def default_sqlite_pragmas():
+    """
+    The SQLite performance profile, from the environment. Set SQLITE_PROFILE=off
+    to keep SQLite's defaults (rollback journal, full sync, no busy timeout).
+    Foreign keys stay unenforced unless SQLITE_FOREIGN_KEYS=ON: older databases
+    still have order_item and feedback pointing at the legacy "order" table.
+    """
+    if os.getenv('SQLITE_PROFILE', 'production').lower() in ('off', 'none', 'false', '0'):
+        return None
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # milliseconds
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),  # negative means KiB, so 64 MB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),  # bytes
+        'foreign_keys': os.getenv('SQLITE_FOREIGN_KEYS', 'OFF')
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Run the pragmas on a new DB-API connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def configure_sqlite_engine(engine, pragmas):
+    """Apply the pragmas to every new connection of a SQLite engine; other engines are left alone."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return False
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    # Connections opened before the listener existed don't have the pragmas
+    engine.dispose()
+    logger.info(f"SQLite profile for {engine.url.database}: {pragmas}")
+    return True
+
+def is_database_locked(error):
+    """Whether an exception is SQLite giving up on a lock."""
+    return isinstance(error, OperationalError) and (
+        'database is locked' in str(error.orig) or 'database is busy' in str(error.orig)
+    )
+
+@event.listens_for(Session, 'after_commit')
+def _mark_committed(session):
+    # Lets retry_on_locked tell a failed transaction from a failure after the commit
+    if has_app_context():
+        g.write_committed = True
+
+def retry_on_locked(view):
+    """
+    Re-run a write view when SQLite reports the database as locked.
+    The session is rolled back before each retry, so the view must do its
+    side effects (notifications) only after it commits. Once the view has
+    committed it is never re-run, as that would write everything again.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Import here to avoid circular imports
+        from extensions import db
+
+        for attempt in range(SQLITE_LOCK_RETRIES + 1):
+            g.write_committed = False
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                if not is_database_locked(e) or attempt == SQLITE_LOCK_RETRIES or g.write_committed:
+                    raise
+                db.session.rollback()
+                delay = SQLITE_LOCK_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Database locked in {view.__name__}, retry {attempt + 1} in {delay:.3f}s")
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime, timedelta
+from threading import Lock
+
+from models import db, Order
+
+# Hour-of-week traffic per restaurant: order counts, revenue and average prep time
+# binned into a 7 x 24 grid (Monday 00:00 UTC first). Built from the last
+# TRAFFIC_WINDOW_DAYS of orders and cached until the UTC day changes.
+TRAFFIC_WINDOW_DAYS = int(os.getenv('TRAFFIC_WINDOW_DAYS', 90))
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HOURS_PER_WEEK = 7 * 24
+
+traffic_heatmaps = {}  # restaurant_id -> (UTC date built, heatmap)
+_lock = Lock()
+
+def hour_of_week_bins(timestamps):
+    """Map datetime64[s] timestamps to 0..167, Monday 00:00 first."""
+    import numpy as np
+
+    seconds = timestamps.astype('int64')
+    # 1970-01-01 was a Thursday, weekday 3 counting from Monday
+    weekdays = (seconds // 86400 + 3) % 7
+    hours = (seconds % 86400) // 3600
+    return (weekdays * 24 + hours).astype(np.intp)
+
+def build_traffic_heatmap(restaurant_id, days=TRAFFIC_WINDOW_DAYS, now=None):
+    """Bin a restaurant's non-cancelled orders of the last days into hour-of-week grids."""
+    import numpy as np
+
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=days)
+    rows = db.session.query(Order.created_at, Order.completed_at, Order.total_amount).filter(
+        Order.user_id == restaurant_id,
+        Order.status != 'cancelled',
+        Order.created_at >= since
+    ).all()
+
+    if rows:
+        created_at, completed_at, amounts = zip(*rows)
+    else:
+        created_at, completed_at, amounts = (), (), ()
+    created = np.array(created_at, dtype='datetime64[s]')
+    completed = np.array(completed_at, dtype='datetime64[s]')  # None becomes NaT
+    amounts = np.array([amount or 0.0 for amount in amounts], dtype=np.float64)
+
+    bins = hour_of_week_bins(created)
+    counts = np.bincount(bins, minlength=HOURS_PER_WEEK)
+    revenue = np.bincount(bins, weights=amounts, minlength=HOURS_PER_WEEK)
+
+    # Prep time from placing to completing, for completed orders only
+    has_prep = ~np.isnat(completed)
+    prep_minutes = (completed[has_prep] - created[has_prep]).astype('int64') / 60.0
+    prep_counts = np.bincount(bins[has_prep], minlength=HOURS_PER_WEEK)
+    prep_totals = np.bincount(bins[has_prep], weights=prep_minutes, minlength=HOURS_PER_WEEK)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_prep = np.where(prep_counts > 0, prep_totals / prep_counts, np.nan)
+
+    return {
+        'restaurant_id': restaurant_id,
+        'since': since.isoformat(),
+        'generated_at': now.isoformat(),
+        'window_days': days,
+        'timezone': 'UTC',
+        'weekdays': WEEKDAYS,
+        'total_orders': int(counts.sum()),
+        'order_counts': counts.reshape(7, 24).tolist(),
+        'revenue': np.round(revenue, 2).reshape(7, 24).tolist(),
+        'avg_prep_minutes': [
+            [None if np.isnan(value) else round(float(value), 1) for value in day]
+            for day in avg_prep.reshape(7, 24)
+        ]
+    }
+
+def get_traffic_heatmap(restaurant_id):
+    """Get the restaurant's heatmap, building it at most once per UTC day."""
+    today = datetime.utcnow().date()
+    with _lock:
+        cached = traffic_heatmaps.get(restaurant_id)
+    if cached and cached[0] == today:
+        return cached[1]
+
+    heatmap = build_traffic_heatmap(restaurant_id)
+    with _lock:
+        traffic_heatmaps[restaurant_id] = (today, heatmap)
+    return heatmap
+
+def peak_hours(heatmap, limit=None):
+    """Hours of the day ranked by order count, summed over the week."""
+    totals = [sum(day[hour] for day in heatmap['order_counts']) for hour in range(24)]
+    ranked = sorted(
+        ({'hour': hour, 'order_count': count} for hour, count in enumerate(totals) if count),
+        key=lambda row: row['order_count'], reverse=True
+    )
+    return ranked[:limit] if limit else ranked